@@ -0,0 +1,82 @@
+"""Adjacency index over the columns of a compact snapshot.
+
+Channels are grouped by source and by target address id in compressed sparse row
+form: the outgoing channels of address `a` are `out_edges[out_offsets[a]:out_offsets[a + 1]]`,
+as edge indices into the snapshot columns, and likewise for incoming channels. The
+index is built once per snapshot in O(nodes + edges + addresses), afterwards the
+neighbourhood of an address is extracted without looking at the rest of the graph.
+"""
+
+from array import array
+from typing import List, Tuple
+
+from wire_format import Snapshot
+
+
+def _csr(keys: array, size: int) -> Tuple[array, array]:
+    """Offsets and positions of `keys` grouped by key, a counting sort."""
+    offsets = array("I", bytes(4 * (size + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    positions = array("I", bytes(4 * len(keys)))
+    cursor = offsets[:-1]
+    for position, key in enumerate(keys):
+        positions[cursor[key]] = position
+        cursor[key] += 1
+    return offsets, positions
+
+
+class AdjacencyIndex:
+    """Incoming and outgoing channels of every address of a snapshot."""
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.out_offsets, self.out_edges = _csr(snapshot.edge_source, snapshot.address_count)
+        self.in_offsets, self.in_edges = _csr(snapshot.edge_target, snapshot.address_count)
+        # node row of every address id, -1 if the address is not a node of the snapshot
+        self.node_rows = array("i", [-1]) * snapshot.address_count
+        for row, address_id in enumerate(snapshot.node_ids):
+            self.node_rows[address_id] = row
+
+    def outgoing(self, address_id: int) -> array:
+        return self.out_edges[self.out_offsets[address_id]:self.out_offsets[address_id + 1]]
+
+    def incoming(self, address_id: int) -> array:
+        return self.in_edges[self.in_offsets[address_id]:self.in_offsets[address_id + 1]]
+
+    def neighbourhood(self, address_id: int, hops: int) -> Tuple[List[int], List[int]]:
+        """Nodes within `hops` channels of an address, in either direction, and the channels between them.
+
+        :return: Node rows and edge indices into the snapshot columns, empty if the address is not a node
+        """
+        if address_id >= self.snapshot.address_count or self.node_rows[address_id] < 0:
+            return [], []
+
+        visited = {address_id}
+        frontier = [address_id]
+        for _ in range(hops):
+            next_frontier = []
+            for node in frontier:
+                for edge in self.outgoing(node):
+                    neighbour = self.snapshot.edge_target[edge]
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+                for edge in self.incoming(node):
+                    neighbour = self.snapshot.edge_source[edge]
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+        edges = [
+            edge
+            for node in visited
+            for edge in self.outgoing(node)
+            if self.snapshot.edge_target[edge] in visited
+        ]
+        # channel endpoints that are not nodes of the snapshot have no row
+        rows = [self.node_rows[node] for node in visited if self.node_rows[node] >= 0]
+        return sorted(rows), sorted(edges)
@@ -1,12 +1,36 @@
-import { BigNumber } from 'bignumber.js';
 import express, { NextFunction, Request, Response } from 'express';
-import * as data from './hopr_channels_events.json';
+import * as fs from 'fs';
+import { StringDecoder } from 'string_decoder';
 
 const app = express();
 const port = 3000;
 
+// bigint amounts are sent as decimal strings, JSON has no exact representation for them
+app.set('json replacer', (key, value) => (typeof value === 'bigint' ? value.toString() : value));
+
+const eventsFile = process.env.HOPR_CHANNELS_EVENTS_FILE || './hopr_channels_events.json';
+// change feed appended to by the event scanner after every scanned chunk
+const feedFile = process.env.HOPR_CHANNELS_FEED_FILE || './hopr_channels_feed.jsonl';
+const feedPollIntervalMs = 1000;
+
+// compact snapshots of the latest and the most recently requested block heights, written regularly
+// and served right after a restart while the event history is replayed again in the background
+const checkpointFile = process.env.HOPR_NETWORK_CHECKPOINT_FILE || './hopr_network_checkpoint.json';
+const checkpointIntervalMs = 60 * 1000;
+const checkpointRecentHeights = 32;
+// same as chain_reorg_safety_blocks of the event scanner, older blocks are never scanned again with other events
+const reorgSafetyBlocks = 10;
+// blocks replayed before yielding to pending requests
+const replayBatchBlocks = 1000;
+
 app.listen(port, () => {
-  processHoprEvents();
+  loadEvents();
+  loadCheckpoint();
+  processHoprEvents(() => {
+    writeCheckpoint();
+    setInterval(pollFeed, feedPollIntervalMs);
+    setInterval(writeCheckpoint, checkpointIntervalMs);
+  });
   console.log(`Timezones by location application is running on port ${port}.`);
 });
 
@@ -25,8 +49,8 @@ class HoprChannel {
   // todo change type to Account
   dest: string
 
-  balance: BigNumber
-  weight: BigNumber
+  balance: bigint
+  weight: bigint
   // uint256 balance;
   // bytes32 commitment;
   // uint256 ticketEpoch;
@@ -41,8 +65,8 @@ class HoprNode {
   account: string;
   publicKey: string;
   outgoingChannels: HoprChannel[]
-  importanceScore: BigNumber
-  stake: BigNumber
+  importanceScore: bigint
+  stake: bigint
 }
 
 type HoprNodes = Record<string, HoprNode>;
@@ -56,34 +80,100 @@ class HoprNetwork {
 type HoprNetworkHistory = Record<string, HoprNetwork>
 
 let networkHistory: HoprNetworkHistory = {}
+// keys of networkHistory in ascending order
+let blockHeights: number[] = []
+let lastIndexedBlock: number = 0
+// state file written by the event scanner
+let data = null
+
+let numChannelsOpened = 0
+let numChannelsClosed = 0
+
+let nodesByAccount: HoprNodes = {};
+let channelsBySrcDst: HoprChannels = {};
+
+// address dictionary of the compact format, append-only so ids stay valid for the whole session
+let addresses: string[] = []
+let addressIds: Record<string, number> = {}
+// names the numbering of the addresses, a new session numbers them anew unless it restores a checkpoint
+let addressEpoch: string = Date.now().toString(36)
+// encoded compact snapshots by the block height of their networkHistory entry
+let compactSnapshots: Record<string, Buffer> = {}
+
+// true until the events file is replayed, requests are served from the checkpoint meanwhile
+let replaying = true
+// blocks with events in the events file, what blockHeights will be once the replay is done
+let eventsFileHeights: number[] = []
+// block heights of the compact snapshots requested most recently, most recent last
+let recentHeights: number[] = []
+
+// fixed-point token amounts, integers counting 10^-fixedPointPrecision HOPR, see fixed_point.py
+// for the arithmetic. Values the network does not have (unfunded channels, nodes without
+// outgoing channels) are undefined.
+const tokenDecimals = 18;
+const fixedPointPrecision = 6;
+const fixedPointScale = 10n ** BigInt(fixedPointPrecision);
+const weiPerUnit = 10n ** BigInt(tokenDecimals - fixedPointPrecision);
+const int64Min = -(2n ** 63n);
+const int64Max = 2n ** 63n - 1n;
+
+// wei amounts are decimal strings in the events file, or numbers in files written by older scanners
+const fromWei = (wei: string | number): bigint => {
+  let value = BigInt(wei) / weiPerUnit;
+  if (value <= int64Min || value > int64Max) {
+    throw new RangeError(wei + " wei does not fit an int64 with " + fixedPointPrecision + " decimals");
+  }
+  return value;
+}
+
+const isqrt = (value: bigint): bigint => {
+  if (value < 2n) {
+    return value;
+  }
+  let x = value;
+  let y = (x + 1n) / 2n;
+  while (y < x) {
+    x = y;
+    y = (x + value / x) / 2n;
+  }
+  return x;
+}
+
+const channelWeight = (sourceStake: bigint, destStake: bigint, balance: bigint): bigint =>
+  isqrt(destStake * balance * fixedPointScale / sourceStake)
+
+const importanceScore = (stake: bigint, totalWeight: bigint): bigint => totalWeight * stake / fixedPointScale
 
 const calculateStake = (outgoingChannels) => {
-  let stake: BigNumber = new BigNumber(1);
+  let stake: bigint = 1n;
   for (let idx in outgoingChannels) {
-    stake = stake.plus(outgoingChannels[idx].balance)
+    if (outgoingChannels[idx].balance === undefined) {
+      return undefined;
+    }
+    stake += outgoingChannels[idx].balance;
   }
   return stake
 }
 
 const copyChannel = (oldChannel) => {
   let newChannel = new HoprChannel();
-  newChannel.balance = new BigNumber(oldChannel.balance);
+  newChannel.balance = oldChannel.balance;
   newChannel.dest = oldChannel.dest;
   newChannel.source = oldChannel.source;
-  newChannel.weight = new BigNumber(oldChannel.weight)
+  newChannel.weight = oldChannel.weight;
   return newChannel;
 }
 
 const copyNode = (oldNode) => {
   let newNode = new HoprNode()
   newNode.account = oldNode.account;
-  newNode.importanceScore = new BigNumber(oldNode.importanceScore);
+  newNode.importanceScore = oldNode.importanceScore;
   newNode.outgoingChannels = [];
   for (let idx in oldNode.outgoingChannels) {
     newNode.outgoingChannels.push(copyChannel(oldNode.outgoingChannels[idx]));
   }
   newNode.publicKey = oldNode.publicKey;
-  newNode.stake = new BigNumber(oldNode.stake);
+  newNode.stake = oldNode.stake;
 
   return newNode;
 }
@@ -115,26 +205,27 @@ const createNetwork = (currentNodes, currentChannels) => {
 
   // for each node, calculate weight
   for (let key in nodes) {
-    let totalWeight: BigNumber = new BigNumber(0);
+    let totalWeight: bigint = 0n;
     let node = nodes[key];
     for (let idx in node.outgoingChannels) {
       let channel = node.outgoingChannels[idx];
       let otherNode = nodes[channel.dest];
-      let stakeRatio = otherNode.stake.div(node.stake)
-      let weight = stakeRatio.multipliedBy(channel.balance);
-      // console.log("weight " + weight);
-      let sqrtWeight = weight.sqrt();
-      totalWeight = totalWeight.plus(sqrtWeight);
+      if (otherNode === undefined || otherNode.stake === undefined || node.stake === undefined || channel.balance === undefined) {
+        // no weight for this channel and no importance score for the node
+        totalWeight = undefined;
+        continue;
+      }
+      let weight = channelWeight(node.stake, otherNode.stake, channel.balance);
       // update channel with weight
       let channelKey = channel.source + ":" + channel.dest;
-      if (!sqrtWeight.isNaN()) {
-        channels[channelKey].weight = new BigNumber(sqrtWeight);
+      channels[channelKey].weight = weight;
+      if (totalWeight !== undefined) {
+        totalWeight += weight;
       }
     }
 
-    let importanceScore = totalWeight.multipliedBy(node.stake);
-    if (!importanceScore.isNaN()) {
-      nodes[key].importanceScore = new BigNumber(importanceScore);
+    if (totalWeight !== undefined && node.stake !== undefined) {
+      nodes[key].importanceScore = importanceScore(node.stake, totalWeight);
     }
   }
 
@@ -143,95 +234,359 @@ const createNetwork = (currentNodes, currentChannels) => {
   return network
 }
 
-const processHoprEvents = () => {
-  let sortedBlocks = Object.keys(data.blocks).sort((key1, key2) => (key1.localeCompare(key2)))
-
-  let numChannelsOpened = 0
-  let numChannelsClosed = 0
-
-  let nodesByAccount: HoprNodes = {};
-  let channelsBySrcDst: HoprChannels = {};
-
-  for (let idx in sortedBlocks) {
-    var block = sortedBlocks[idx];
-    let sortedTransactions = data.blocks[block]
-    for (let tx in sortedTransactions) {
-      let logIndices = sortedTransactions[tx];
-      for (let logIdx in logIndices) {
-        let message = logIndices[logIdx];
-        let args = message.args;
-        switch (message.event) {
-          case HoprEvent.Announcment:
-            let account = args.account.toLowerCase();
-            if (account in nodesByAccount) {
-              //console.log(account + " already announced to the network");
-            } else {
-              let node = new HoprNode();
-              node.account = account;
-              node.publicKey = args.publicKey;
-              nodesByAccount[account] = node;
-            }
-            break;
-          case HoprEvent.ChannelOpened:
-            var source = args.source.toLowerCase();
-            var dest = args.destination.toLowerCase();
-            var srcDest = source + ":" + dest;
-            if (srcDest in channelsBySrcDst) {
-              // console.log("(" + source + "," + dest + ") already exists");
-            } else {
-              console.log("channel opened" + srcDest);
-              numChannelsOpened++;
-              let channel = new HoprChannel();
-              channel.dest = dest;
-              channel.source = source;
-              channelsBySrcDst[srcDest] = channel;
-            }
-            break;
-          case HoprEvent.ChannelFunded:
-            var source = args.source.toLowerCase();
-            var dest = args.destination.toLowerCase();
-            var srcDest = source + ":" + dest;
-            if (srcDest in channelsBySrcDst) {
-              let channel = channelsBySrcDst[srcDest];
-              channel.balance = new BigNumber(args.amount);
-            } else {
-              //console.error("channel " + srcDest + " not previously seen");
-            }
-            break;
-          case HoprEvent.ChannelUpdated:
-            var source = args.source.toLowerCase();
-            var dest = args.destination.toLowerCase();
-            var srcDest = source + ":" + dest;
-            if (srcDest in channelsBySrcDst) {
-              let channel = channelsBySrcDst[srcDest];
-              channel.balance = new BigNumber(args.newState[0]);
-            } else {
-              //console.error("channel " + srcDest + " not previously seen");
-            }
-            break;
-          case HoprEvent.ChannelClosureFinalized:
-            var source = args.source.toLowerCase();
-            var dest = args.destination.toLowerCase();
-            var srcDest = source + ":" + dest;
-            if (srcDest in channelsBySrcDst) {
-              console.log("channel closed" + srcDest);
-              numChannelsClosed++;
-              delete channelsBySrcDst[srcDest];
-            } else {
-              //console.log("(" + source + "," + dest + ") does not exist");
-            }
-            break;
-          default:
-            // console.log(message.event + " not handled");
-            break;
-        }
+const processBlock = (block: string, sortedTransactions) => {
+  for (let tx in sortedTransactions) {
+    let logIndices = sortedTransactions[tx];
+    for (let logIdx in logIndices) {
+      let message = logIndices[logIdx];
+      let args = message.args;
+      switch (message.event) {
+        case HoprEvent.Announcment:
+          let account = args.account.toLowerCase();
+          if (account in nodesByAccount) {
+            //console.log(account + " already announced to the network");
+          } else {
+            let node = new HoprNode();
+            node.account = account;
+            node.publicKey = args.publicKey;
+            nodesByAccount[account] = node;
+          }
+          break;
+        case HoprEvent.ChannelOpened:
+          var source = args.source.toLowerCase();
+          var dest = args.destination.toLowerCase();
+          var srcDest = source + ":" + dest;
+          if (srcDest in channelsBySrcDst) {
+            // console.log("(" + source + "," + dest + ") already exists");
+          } else {
+            console.log("channel opened" + srcDest);
+            numChannelsOpened++;
+            let channel = new HoprChannel();
+            channel.dest = dest;
+            channel.source = source;
+            channelsBySrcDst[srcDest] = channel;
+          }
+          break;
+        case HoprEvent.ChannelFunded:
+          var source = args.source.toLowerCase();
+          var dest = args.destination.toLowerCase();
+          var srcDest = source + ":" + dest;
+          if (srcDest in channelsBySrcDst) {
+            let channel = channelsBySrcDst[srcDest];
+            channel.balance = fromWei(args.amount);
+          } else {
+            //console.error("channel " + srcDest + " not previously seen");
+          }
+          break;
+        case HoprEvent.ChannelUpdated:
+          var source = args.source.toLowerCase();
+          var dest = args.destination.toLowerCase();
+          var srcDest = source + ":" + dest;
+          if (srcDest in channelsBySrcDst) {
+            let channel = channelsBySrcDst[srcDest];
+            channel.balance = fromWei(args.newState[0]);
+          } else {
+            //console.error("channel " + srcDest + " not previously seen");
+          }
+          break;
+        case HoprEvent.ChannelClosureFinalized:
+          var source = args.source.toLowerCase();
+          var dest = args.destination.toLowerCase();
+          var srcDest = source + ":" + dest;
+          if (srcDest in channelsBySrcDst) {
+            console.log("channel closed" + srcDest);
+            numChannelsClosed++;
+            delete channelsBySrcDst[srcDest];
+          } else {
+            //console.log("(" + source + "," + dest + ") does not exist");
+          }
+          break;
+        default:
+          // console.log(message.event + " not handled");
+          break;
       }
     }
-    networkHistory[block] = createNetwork(nodesByAccount, channelsBySrcDst);
   }
+  networkHistory[block] = createNetwork(nodesByAccount, channelsBySrcDst);
+  blockHeights.push(Number(block));
+}
 
-  console.log("channelsOpened/Closed: " + numChannelsOpened + "/" + numChannelsClosed);
-  console.log("number of items in history: " + Object.keys(networkHistory).length);
+const sortBlocks = (blocks) => Object.keys(blocks).sort((key1, key2) => (Number(key1) - Number(key2)))
+
+// replays in batches so requests for checkpointed and already replayed heights are answered meanwhile
+const processHoprEvents = (done: () => void) => {
+  let sortedBlocks = sortBlocks(data.blocks)
+  let idx = 0;
+  const processBatch = () => {
+    let end = Math.min(idx + replayBatchBlocks, sortedBlocks.length);
+    for (; idx < end; idx++) {
+      let block = sortedBlocks[idx];
+      processBlock(block, data.blocks[block]);
+    }
+    if (idx < sortedBlocks.length) {
+      setImmediate(processBatch);
+      return;
+    }
+    replaying = false;
+
+    console.log("channelsOpened/Closed: " + numChannelsOpened + "/" + numChannelsClosed);
+    console.log("number of items in history: " + Object.keys(networkHistory).length);
+    done();
+  }
+  processBatch();
+}
+
+// a checkpoint is used with an events file that includes every feed record it had applied, the
+// snapshots of blocks a chain reorganisation may still have changed since are left out.
+// Addresses keep their ids
+const loadCheckpoint = () => {
+  let checkpoint;
+  try {
+    checkpoint = JSON.parse(fs.readFileSync(checkpointFile, 'utf8'));
+  } catch (e) {
+    return;
+  }
+  if (checkpoint.formatVersion !== compactFormatVersion || typeof checkpoint.feedSeq !== 'number'
+    || typeof data.feed_seq !== 'number' || data.feed_seq < checkpoint.feedSeq) {
+    console.log("checkpoint " + checkpointFile + " is ahead of the events file or predates feed numbers, ignoring it");
+    return;
+  }
+  let safeBlock = Math.min(checkpoint.lastIndexedBlock, data.last_scanned_block) - reorgSafetyBlocks;
+  // checkpoints written before epochs keep the new one, clients fetch the addresses again
+  if (checkpoint.addressEpoch !== undefined) {
+    addressEpoch = checkpoint.addressEpoch;
+  }
+  for (let address of checkpoint.addresses) {
+    internAddress(address);
+  }
+  for (let height in checkpoint.compactSnapshots) {
+    if (Number(height) <= safeBlock) {
+      compactSnapshots[height] = Buffer.from(checkpoint.compactSnapshots[height], 'base64');
+      recentHeights.push(Number(height));
+    }
+  }
+  console.log("serving " + recentHeights.length + " snapshots from checkpoint " + checkpointFile);
+}
+
+const writeCheckpoint = () => {
+  if (replaying || blockHeights.length === 0) {
+    return;
+  }
+  let heights = recentHeights.filter((height) => height in networkHistory);
+  let latest = blockHeights[blockHeights.length - 1];
+  if (!heights.includes(latest)) {
+    heights.push(latest);
+  }
+  let snapshots: Record<string, string> = {};
+  for (let height of heights) {
+    if (!(height in compactSnapshots)) {
+      compactSnapshots[height] = convertToCompact(networkHistory[height].nodes, networkHistory[height].channels);
+    }
+    snapshots[height] = compactSnapshots[height].toString('base64');
+  }
+  let checkpoint = {
+    formatVersion: compactFormatVersion,
+    // last feed record and block the snapshots include
+    feedSeq: feedReader.seq,
+    lastIndexedBlock: lastIndexedBlock,
+    addressEpoch: addressEpoch,
+    addresses: addresses,
+    compactSnapshots: snapshots,
+  };
+  // replaced atomically, a crash while writing leaves the previous checkpoint
+  fs.writeFileSync(checkpointFile + '.tmp', JSON.stringify(checkpoint));
+  fs.renameSync(checkpointFile + '.tmp', checkpointFile);
+}
+
+const touchRecentHeight = (height: number) => {
+  recentHeights = recentHeights.filter((recent) => recent !== height);
+  recentHeights.push(height);
+  if (recentHeights.length > checkpointRecentHeights) {
+    recentHeights.shift();
+  }
+}
+
+// drop the snapshots from sinceBlock onwards and rewind the replay state to the last one left,
+// snapshots of earlier blocks stay cached
+const deleteSince = (sinceBlock: number) => {
+  if (blockHeights.length === 0 || blockHeights[blockHeights.length - 1] < sinceBlock) {
+    return;
+  }
+  while (blockHeights.length > 0 && blockHeights[blockHeights.length - 1] >= sinceBlock) {
+    let block = blockHeights.pop() + "";
+    delete networkHistory[block];
+    delete compactSnapshots[block];
+  }
+
+  nodesByAccount = {};
+  channelsBySrcDst = {};
+  if (blockHeights.length > 0) {
+    let network = networkHistory[blockHeights[blockHeights.length - 1]];
+    for (let key in network.nodes) {
+      let node = new HoprNode();
+      node.account = network.nodes[key].account;
+      node.publicKey = network.nodes[key].publicKey;
+      nodesByAccount[key] = node;
+    }
+    for (let key in network.channels) {
+      let channel = new HoprChannel();
+      channel.source = network.channels[key].source;
+      channel.dest = network.channels[key].dest;
+      channel.balance = network.channels[key].balance;
+      channelsBySrcDst[key] = channel;
+    }
+  }
+  lastIndexedBlock = Math.min(lastIndexedBlock, sinceBlock - 1);
+}
+
+const applyFeedRecord = (record) => {
+  if (record.type === 'delete') {
+    console.log("deleting blocks since " + record.since_block);
+    deleteSince(record.since_block);
+  } else if (record.type === 'chunk') {
+    // a chunk replaces everything we have from its first block onwards
+    deleteSince(record.from_block);
+    let sortedBlocks = sortBlocks(record.blocks);
+    for (let idx in sortedBlocks) {
+      let block = sortedBlocks[idx];
+      processBlock(block, record.blocks[block]);
+    }
+    lastIndexedBlock = Math.max(lastIndexedBlock, record.to_block);
+  }
+}
+
+class FeedReader {
+  fname: string
+  fd: number = null
+  position: number = 0
+  buffer: string = ''
+  decoder: StringDecoder
+  // sequence number of the last record applied, null if the events file predates sequence numbers
+  seq: number = null
+  // records were missed, e.g. the file was replaced before it was opened
+  gap: boolean = false
+
+  constructor(fname: string) {
+    this.fname = fname;
+  }
+
+  open(): boolean {
+    try {
+      this.fd = fs.openSync(this.fname, 'r');
+    } catch (e) {
+      return false;
+    }
+    this.position = 0;
+    this.buffer = '';
+    this.decoder = new StringDecoder('utf8');
+    return true;
+  }
+
+  // the scanner starts a new feed file every time it saves the full state
+  rotated(): boolean {
+    try {
+      return fs.statSync(this.fname).ino !== fs.fstatSync(this.fd).ino;
+    } catch (e) {
+      return false;
+    }
+  }
+
+  read() {
+    let chunk = Buffer.alloc(1 << 16);
+    let bytesRead: number;
+    while ((bytesRead = fs.readSync(this.fd, chunk, 0, chunk.length, this.position)) > 0) {
+      this.position += bytesRead;
+      this.buffer += this.decoder.write(chunk.subarray(0, bytesRead));
+    }
+    let lines = this.buffer.split('\n');
+    this.buffer = lines.pop();
+    let records = [];
+    for (let line of lines) {
+      try {
+        records.push(JSON.parse(line));
+      } catch (e) {
+        // cut short by a scanner crash, the scanner numbers the next record as if it never was
+      }
+    }
+    return records;
+  }
+
+  // records appended since the last poll, the old file is read to the end before switching over
+  poll() {
+    if (this.fd === null && !this.open()) {
+      return [];
+    }
+    let rotated = this.rotated();
+    let records = this.read();
+    if (rotated) {
+      fs.closeSync(this.fd);
+      this.fd = null;
+      if (this.open()) {
+        records = records.concat(this.read());
+      }
+    }
+    return this.inSequence(records);
+  }
+
+  // drops records the events file already contains and stops at the first missing one
+  inSequence(records) {
+    let fresh = [];
+    for (let record of records) {
+      if (record.seq === undefined || this.seq === null) {
+        fresh.push(record);
+        this.seq = record.seq === undefined ? this.seq : record.seq;
+      } else if (record.seq > this.seq + 1) {
+        this.gap = true;
+        break;
+      } else if (record.seq === this.seq + 1) {
+        fresh.push(record);
+        this.seq = record.seq;
+      }
+    }
+    return fresh;
+  }
+}
+
+let feedReader: FeedReader = null;
+
+// the feed is opened before the events file is read, so chunks scanned in between are not lost
+// when the scanner saves its state and starts a new feed
+const loadEvents = () => {
+  if (feedReader !== null && feedReader.fd !== null) {
+    fs.closeSync(feedReader.fd);
+  }
+  feedReader = new FeedReader(feedFile);
+  feedReader.open();
+  data = JSON.parse(fs.readFileSync(eventsFile, 'utf8'));
+  feedReader.seq = data.feed_seq === undefined ? null : data.feed_seq;
+  lastIndexedBlock = data.last_scanned_block;
+  eventsFileHeights = sortBlocks(data.blocks).map(Number);
+}
+
+// start over from the events file, the replay state cannot be repaired without the missed records
+const reloadEvents = () => {
+  networkHistory = {};
+  blockHeights = [];
+  nodesByAccount = {};
+  channelsBySrcDst = {};
+  compactSnapshots = {};
+  recentHeights = [];
+  replaying = true;
+  loadEvents();
+  processHoprEvents(writeCheckpoint);
+}
+
+const pollFeed = () => {
+  if (replaying) {
+    return;
+  }
+  for (let record of feedReader.poll()) {
+    applyFeedRecord(record);
+  }
+  if (feedReader.gap) {
+    console.log("records missing from the change feed, reloading " + eventsFile);
+    reloadEvents();
+  }
 }
 
 const convertToCytoscape = (nodesByAccount, channelsBySrcDst) => {
@@ -244,11 +599,11 @@ const convertToCytoscape = (nodesByAccount, channelsBySrcDst) => {
         'label': id.substring(0, 10)
       }
     }
-    if (!nodesByAccount[id].importanceScore.isNaN()) {
-      data['data']['importance'] = nodesByAccount[id].importanceScore
+    if (nodesByAccount[id].importanceScore !== undefined) {
+      data['data']['importance'] = nodesByAccount[id].importanceScore.toString()
     }
-    if (!nodesByAccount[id].stake.isNaN()) {
-      data['data']['stake'] = nodesByAccount[id].stake
+    if (nodesByAccount[id].stake !== undefined) {
+      data['data']['stake'] = nodesByAccount[id].stake.toString()
     }
 
     nodes.push(data)
@@ -261,12 +616,12 @@ const convertToCytoscape = (nodesByAccount, channelsBySrcDst) => {
       }
     }
 
-    if (!channelsBySrcDst[id].weight.isNaN()) {
-      data['data']['weight'] = channelsBySrcDst[id].weight
+    if (channelsBySrcDst[id].weight !== undefined) {
+      data['data']['weight'] = channelsBySrcDst[id].weight.toString()
     }
 
-    if (!channelsBySrcDst[id].balance.isNaN()) {
-      data['data']['balance'] = channelsBySrcDst[id].balance
+    if (channelsBySrcDst[id].balance !== undefined) {
+      data['data']['balance'] = channelsBySrcDst[id].balance.toString()
     }
     edges.push(data)
   }
@@ -274,28 +629,128 @@ const convertToCytoscape = (nodesByAccount, channelsBySrcDst) => {
   return { 'nodes': nodes, 'edges': edges }
 }
 
-const getHoprNetwork = (request: Request, response: Response, next: NextFunction) => {
-  let network: HoprNetwork = networkHistory['20637852']
-  if (request.query['blockHeight'] !== undefined) {
-    let blockHeight = request.query['blockHeight'] + ""
-    if (blockHeight in networkHistory) {
-      network = networkHistory[blockHeight]
-    } else {
-      // find the last block with events in it
-      let prevHeight = '0'
-      let sortedBlocks = Object.keys(networkHistory).sort((key1, key2) => (key1.localeCompare(key2)))
-      for (let idx in sortedBlocks) {
-        if (blockHeight < sortedBlocks[idx]) {
-          break;
-        }
-        prevHeight = sortedBlocks[idx];
+const compactFormatVersion = 2;
+// fixed_point.MISSING
+const int64Missing = int64Min;
+
+const internAddress = (address: string): number => {
+  if (!(address in addressIds)) {
+    addressIds[address] = addresses.length;
+    addresses.push(address);
+  }
+  return addressIds[address];
+}
+
+const toInt64 = (value: bigint): bigint => {
+  if (value === undefined) {
+    return int64Missing;
+  }
+  if (value <= int64Min || value > int64Max) {
+    throw new RangeError(value + " does not fit an int64");
+  }
+  return value;
+}
+
+// see wire_format.py for the layout, typed arrays are little-endian on every platform node runs on
+const convertToCompact = (nodesByAccount: HoprNodes, channelsBySrcDst: HoprChannels): Buffer => {
+  // only nodes with at least one channel, the dashboard does not render the others
+  let accounts: string[] = [];
+  let channels: HoprChannel[] = [];
+  let seen: Record<string, boolean> = {};
+  for (let id in channelsBySrcDst) {
+    let channel = channelsBySrcDst[id];
+    channels.push(channel);
+    for (let account of [channel.source, channel.dest]) {
+      if (!(account in seen)) {
+        seen[account] = true;
+        accounts.push(account);
       }
-      network = networkHistory[prevHeight];
     }
   }
 
+  let nodeIds = new Uint32Array(accounts.length);
+  let stake = new BigInt64Array(accounts.length);
+  let importance = new BigInt64Array(accounts.length);
+  accounts.forEach((account, idx) => {
+    let node = nodesByAccount[account];
+    nodeIds[idx] = internAddress(account);
+    stake[idx] = node === undefined ? int64Missing : toInt64(node.stake);
+    importance[idx] = node === undefined ? int64Missing : toInt64(node.importanceScore);
+  });
+
+  let edgeSource = new Uint32Array(channels.length);
+  let edgeTarget = new Uint32Array(channels.length);
+  let balance = new BigInt64Array(channels.length);
+  let weight = new BigInt64Array(channels.length);
+  channels.forEach((channel, idx) => {
+    edgeSource[idx] = internAddress(channel.source);
+    edgeTarget[idx] = internAddress(channel.dest);
+    balance[idx] = toInt64(channel.balance);
+    weight[idx] = toInt64(channel.weight);
+  });
+
+  let header = new Uint32Array([compactFormatVersion, accounts.length, channels.length, addresses.length]);
+  return Buffer.concat([header, stake, importance, balance, weight, nodeIds, edgeSource, edgeTarget].map(
+    (column) => Buffer.from(column.buffer, column.byteOffset, column.byteLength)
+  ));
+}
+
+// block height of the networkHistory entry for the last block with events at or before blockHeight
+const snapshotHeightAt = (heights: number[], blockHeight: number): number => {
+  let lo = 0;
+  let hi = heights.length;
+  while (lo < hi) {
+    let mid = (lo + hi) >> 1;
+    if (heights[mid] <= blockHeight) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  if (lo === 0) {
+    return undefined;
+  }
+  return heights[lo - 1];
+}
+
+const replayingResponse = (response: Response) => {
+  response.status(503).set('Retry-After', '1').json({ error: "replaying events, try again shortly" });
+}
+
+const getHoprNetwork = (request: Request, response: Response, next: NextFunction) => {
+  let blockHeight = lastIndexedBlock;
+  if (request.query['blockHeight'] !== undefined) {
+    blockHeight = Number(request.query['blockHeight']);
+  }
+  // known from the events file while replaying, heights not replayed yet are served from the checkpoint
+  let heights = replaying ? eventsFileHeights : blockHeights;
+  let height = snapshotHeightAt(heights, blockHeight)
+  if (height === undefined) {
+    response.status(404).json({ error: "no events at or before this block height" });
+    return;
+  }
+  // lets clients cache the snapshot by the height it belongs to rather than the requested one
+  response.set('X-Snapshot-Height', String(height));
+  // ids in compact snapshots refer to the addresses of this epoch
+  response.set('X-Address-Epoch', addressEpoch);
+
+  if (request.query['format'] === 'compact' && height in compactSnapshots) {
+    touchRecentHeight(height);
+    response.status(200).type('application/octet-stream').send(compactSnapshots[height]);
+    return;
+  }
+  let network: HoprNetwork = networkHistory[height]
+  if (network === undefined) {
+    replayingResponse(response);
+    return;
+  }
+
   if (request.query['format'] === 'cytoscape') {
     response.status(200).json(convertToCytoscape(network.nodes, network.channels));
+  } else if (request.query['format'] === 'compact') {
+    compactSnapshots[height] = convertToCompact(network.nodes, network.channels);
+    touchRecentHeight(height);
+    response.status(200).type('application/octet-stream').send(compactSnapshots[height]);
   } else {
     response.status(200).json({ nodes: network.nodes, channels: network.channels })
   }
@@ -303,4 +758,21 @@ const getHoprNetwork = (request: Request, response: Response, next: NextFunction
 };
 app.get('/network', getHoprNetwork);
 
+const getStatus = (request: Request, response: Response, next: NextFunction) => {
+  let heights = replaying ? eventsFileHeights : blockHeights;
+  response.status(200).json({
+    firstBlock: heights.length > 0 ? heights[0] : null,
+    lastIndexedBlock: lastIndexedBlock,
+    replaying: replaying,
+  });
+};
+app.get('/status', getStatus);
+
+// address dictionary of the compact format, from an id onwards so clients only fetch new entries
+const getAddresses = (request: Request, response: Response, next: NextFunction) => {
+  let from = Number(request.query['from'] || 0);
+  response.set('X-Address-Epoch', addressEpoch).status(200).json(addresses.slice(from));
+};
+app.get('/addresses', getAddresses);
+
 // 20570425
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Benchmark the slider callback of the dashboard.
+
+Replays a slider drag, either recorded or synthetic, against `update_output` in
+`viz.py` and reports latency percentiles for every stage of the callback.
+Snapshots are served by a local stub of the graph API, so only the dashboard
+side is measured. The stub replays an events file, or generates random graphs.
+
+    python bench_viz.py --events api/hopr_channels_events.json --steps 500
+    python bench_viz.py --nodes 500 --edges 3000 --trace drag.json
+    python bench_viz.py --events api/hopr_channels_events.json --focus 0x... --hops 2
+
+A recorded trace is a JSON list of slider values, or of `{"value": ...}` objects.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from fixed_point import SCALE, fixed_array
+from hopr_network import iter_events, iter_snapshots, load_state
+from wire_format import Snapshot, encode_snapshot
+
+HOPR_CHANNELS_CREATION_BLOCKHEIGHT = 20307201
+HOPR_CHANNELS_LAST_INDEXED_BLOCKHEIGHT = 20637852
+
+
+def load_trace(fname: str) -> List[int]:
+    with open(fname, "rt") as f:
+        trace = json.load(f)
+    return [int(v["value"]) if isinstance(v, dict) else int(v) for v in trace]
+
+
+def synthetic_trace(start_block: int, end_block: int, steps: int, seed: int = 0) -> List[int]:
+    """A drag across the block range, mostly forward with some back and forth like a hand on a slider."""
+    rng = random.Random(seed)
+    step = max(1, (end_block - start_block) // steps)
+    trace, value = [], start_block
+    for _ in range(steps):
+        value += int(step * rng.uniform(-0.5, 2.0))
+        value = min(max(value, start_block), end_block)
+        trace.append(value)
+    return trace
+
+
+class StubPayloads:
+    """Compact snapshots by block height plus the address dictionary they refer to."""
+
+    def __init__(self):
+        self.snapshots: Dict[int, bytes] = {}
+        self.addresses: List[str] = []
+        self.address_ids: Dict[str, int] = {}
+
+    def intern(self, address: str) -> int:
+        if address not in self.address_ids:
+            self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return self.address_ids[address]
+
+    def add(self, height: int, nodes: List[Tuple[str, Optional[int], Optional[int]]],
+            edges: List[Tuple[str, str, Optional[int], Optional[int]]]):
+        """Encode a snapshot from (address, stake, importance) and (source, target, balance, weight) tuples.
+
+        Values are fixed-point integers or `None`.
+        """
+        node_ids = array("I", [self.intern(address) for address, _, _ in nodes])
+        edge_source = array("I", [self.intern(source) for source, _, _, _ in edges])
+        edge_target = array("I", [self.intern(target) for _, target, _, _ in edges])
+        self.snapshots[height] = encode_snapshot(Snapshot(
+            len(self.addresses),
+            node_ids,
+            fixed_array(stake for _, stake, _ in nodes),
+            fixed_array(importance for _, _, importance in nodes),
+            edge_source,
+            edge_target,
+            fixed_array(balance for _, _, balance, _ in edges),
+            fixed_array(weight for _, _, _, weight in edges),
+        ))
+
+
+def replayed_payloads(events_fname: str, heights: List[int]) -> StubPayloads:
+    state = load_state(events_fname)
+    payloads = StubPayloads()
+    for height, network in iter_snapshots(iter_events(state), sorted(set(heights))):
+        nodes = [
+            (account, node.stake, node.importance)
+            for account, node in network.connected_nodes().items()
+        ]
+        edges = [
+            (channel.source, channel.dest, channel.balance, channel.weight)
+            for channel in network.channels.values()
+        ]
+        payloads.add(height, nodes, edges)
+    return payloads
+
+
+def synthetic_payloads(heights: List[int], nodes: int, edges: int) -> StubPayloads:
+    payloads = StubPayloads()
+    for height in sorted(set(heights)):
+        rng = random.Random(height)
+        accounts = ["0x%040x" % rng.getrandbits(160) for _ in range(nodes)]
+        payloads.add(
+            height,
+            [(account, rng.randint(1, 10**6 * SCALE), rng.randint(SCALE, 10**10 * SCALE)) for account in accounts],
+            [(*rng.sample(accounts, 2), rng.randint(1, 10**5 * SCALE), rng.randint(1, 10**4 * SCALE))
+             for _ in range(edges)],
+        )
+    return payloads
+
+
+def serve_stub(payloads: StubPayloads) -> ThreadingHTTPServer:
+    """Start the graph API stub on a free local port."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/addresses":
+                payload = json.dumps(payloads.addresses[int(query.get("from", ["0"])[0]):]).encode()
+                content_type = "application/json"
+            elif url.path == "/status":
+                heights = sorted(payloads.snapshots)
+                payload = json.dumps({
+                    "firstBlock": heights[0] if heights else None,
+                    "lastIndexedBlock": heights[-1] if heights else 0,
+                    "replaying": False,
+                }).encode()
+                content_type = "application/json"
+            else:
+                payload = payloads.snapshots.get(int(query["blockHeight"][0]))
+                content_type = "application/octet-stream"
+            if payload is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(trace: List[int], payloads: StubPayloads, focus: str = None, hops: int = 0) -> Dict[str, dict]:
+    """Call the slider callback for every value of the trace.
+
+    With `focus` and `hops` the ego-network view around that address is rendered instead of the whole network.
+
+    :return: Latency summary per stage, see `metrics.StageTimings.summary`
+    """
+    server = serve_stub(payloads)
+    os.environ["HOPR_NETWORK_API"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Imported only now, the API address is read when the module is loaded
+    import plotly
+    import viz
+
+    # The function as written, without the Dash callback context wrapper
+    update_output = viz.update_output.__wrapped__
+    # Snapshot heights are looked up in the event indexes, loaded here without the warm-up
+    # so the trace starts from a cold cache
+    viz.load_event_indexes()
+
+    viz.timings.reset()
+    for blockheight in trace:
+        start = time.perf_counter()
+        output = update_output(blockheight, focus, hops, [], [])
+        # Dash serializes callback outputs with the plotly encoder
+        with viz.timings.time("serialize"):
+            json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder)
+        viz.timings.record("total", time.perf_counter() - start)
+
+    server.shutdown()
+    return viz.timings.summary()
+
+
+def print_summary(summary: Dict[str, dict]):
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, s in summary.items():
+        print(f"{stage:<24}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay slider drags against the dashboard callback")
+    parser.add_argument("--events", help="Serve snapshots replayed from this events file instead of random graphs")
+    parser.add_argument("--trace", help="JSON file with recorded slider values")
+    parser.add_argument("--steps", type=int, default=200, help="Length of the synthetic trace")
+    parser.add_argument("--nodes", type=int, default=200, help="Nodes of random graphs")
+    parser.add_argument("--edges", type=int, default=1000, help="Edges of random graphs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--focus", help="Address to render the ego-network view around")
+    parser.add_argument("--hops", type=int, default=0, help="Radius of the ego-network view, 0 for the whole network")
+    parser.add_argument("--output", help="Also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(HOPR_CHANNELS_CREATION_BLOCKHEIGHT, HOPR_CHANNELS_LAST_INDEXED_BLOCKHEIGHT,
+                                args.steps, args.seed)
+
+    if args.events:
+        os.environ.setdefault("HOPR_CHANNELS_EVENTS_FILE", args.events)
+        payloads = replayed_payloads(args.events, trace)
+    else:
+        payloads = synthetic_payloads(trace, args.nodes, args.edges)
+
+    summary = run(trace, payloads, args.focus, args.hops)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "wt") as f:
+            json.dump(summary, f, indent=2)
@@ -9,17 +9,16 @@ import time
 import logging
 import os
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional, Callable, List, Iterable
+from typing import Tuple, Optional, Callable, Dict, List, Iterable
 
 from web3 import Web3
-from web3.contract import Contract
 from web3.datastructures import AttributeDict
 from web3.exceptions import BlockNotFound
 from eth_abi.codec import ABICodec
+from eth_utils import event_abi_to_log_topic
 
 # Currently this method is not exposed over official web3 API,
-# but we need it to construct eth_getLogs parameters
-from web3._utils.filters import construct_event_filter_params
+# but we need it to decode raw eth_getLogs results
 from web3._utils.events import get_event_data
 
 
@@ -72,6 +71,13 @@ class EventScannerState(ABC):
         Purges any potential minor reorg data.
         """
 
+    def process_block_timestamp(self, block_number: int, block_when: datetime.datetime):
+        """Scanner resolved when the last block of a chunk was mined.
+
+        Together with the timestamps passed to `process_event` these are free anchors
+        for mapping between block numbers and time. Ignored unless overridden.
+        """
+
 
 class EventScanner:
     """Scan blockchain for events and try not to abuse JSON-RPC API too much.
@@ -84,23 +90,29 @@ class EventScanner:
     because it cannot correctly throttle and decrease the `eth_getLogs` block number range.
     """
 
-    def __init__(self, web3: Web3, contract: Contract, state: EventScannerState, events: List, filters: {},
+    def __init__(self, web3: Web3, state: EventScannerState, events: List, filters: Dict[str, Callable] = None,
                  max_chunk_scan_size: int = 10000, max_request_retries: int = 30, request_retry_seconds: float = 3.0):
         """
-        :param contract: Contract
-        :param events: List of web3 Event we scan
-        :param filters: Filters passed to getLogs
+        :param events: List of web3 Event we scan, of contracts created with an address. Events of all contracts are fetched with a single `eth_getLogs` call per chunk
+        :param filters: Predicates on decoded events by contract address, for events `eth_getLogs` topics cannot narrow down. Events they reject are not processed
         :param max_chunk_scan_size: JSON-RPC API limit in the number of blocks we query. (Recommendation: 10,000 for mainnet, 500,000 for testnets)
         :param max_request_retries: How many times we try to reattempt a failed JSON-RPC call
         :param request_retry_seconds: Delay between failed requests to let JSON-RPC server to recover
         """
 
         self.logger = logger
-        self.contract = contract
         self.web3 = web3
         self.state = state
         self.events = events
-        self.filters = filters
+        self.filters = {address.lower(): f for address, f in (filters or {}).items()}
+
+        # Decoding ABI by (contract address, event topic), how every raw log is routed
+        self.event_abis = {}
+        for event in events:
+            abi = event._get_event_abi()
+            self.event_abis[(event.address.lower(), event_abi_to_log_topic(abi))] = abi
+        self.addresses = sorted({address for address, _ in self.event_abis})
+        self.topics = sorted({topic for _, topic in self.event_abis})
 
         # Our JSON-RPC throttling parameters
         self.min_scan_chunk_size = 10  # 12 s/block = 120 seconds period
@@ -115,10 +127,6 @@ class EventScanner:
         # Factor how was we increase chunk size if no results found
         self.chunk_size_increase = 2.0
 
-    @property
-    def address(self):
-        return self.token_address
-
     def get_block_timestamp(self, block_num) -> datetime.datetime:
         """Get Ethereum block timestamp"""
         try:
@@ -159,12 +167,12 @@ class EventScanner:
         """Purge old data in the case of blockchain reorganisation."""
         self.state.delete_data(after_block)
 
-    def scan_chunk(self, start_block, end_block) -> Tuple[int, datetime.datetime, list]:
+    def scan_chunk(self, start_block, end_block) -> Tuple[int, datetime.datetime, list, int]:
         """Read and process events between to block numbers.
 
         Dynamically decrease the size of the chunk if the case JSON-RPC server pukes out.
 
-        :return: tuple(actual end block number, when this block was mined, processed events)
+        :return: tuple(actual end block number, when this block was mined, processed events, logs `eth_getLogs` returned)
         """
 
         block_timestamps = {}
@@ -179,44 +187,47 @@ class EventScanner:
 
         all_processed = []
 
-        for event_type in self.events:
-
-            # Callable that takes care of the underlying web3 call
-            def _fetch_events(_start_block, _end_block):
-                return _fetch_events_for_all_contracts(self.web3,
-                                                       event_type,
-                                                       self.filters,
-                                                       from_block=_start_block,
-                                                       to_block=_end_block)
-
-            # Do `n` retries on `eth_getLogs`,
-            # throttle down block range if needed
-            end_block, events = _retry_web3_call(
-                _fetch_events,
-                start_block=start_block,
-                end_block=end_block,
-                retries=self.max_request_retries,
-                delay=self.request_retry_seconds)
-
-            for evt in events:
-                idx = evt["logIndex"]  # Integer of the log index position in the block, null when its pending
-
-                # We cannot avoid minor chain reorganisations, but
-                # at least we must avoid blocks that are not mined yet
-                assert idx is not None, "Somehow tried to scan a pending block"
+        # Callable that takes care of the underlying web3 call
+        def _fetch_events(_start_block, _end_block):
+            return _fetch_events_for_all_contracts(self.web3,
+                                                   self.event_abis,
+                                                   self.addresses,
+                                                   self.topics,
+                                                   from_block=_start_block,
+                                                   to_block=_end_block)
+
+        # Do `n` retries on `eth_getLogs`,
+        # throttle down block range if needed
+        end_block, (logs_found, events) = _retry_web3_call(
+            _fetch_events,
+            start_block=start_block,
+            end_block=end_block,
+            retries=self.max_request_retries,
+            delay=self.request_retry_seconds)
+
+        for evt in events:
+            idx = evt["logIndex"]  # Integer of the log index position in the block, null when its pending
+
+            # We cannot avoid minor chain reorganisations, but
+            # at least we must avoid blocks that are not mined yet
+            assert idx is not None, "Somehow tried to scan a pending block"
+
+            accept = self.filters.get(evt["address"].lower())
+            if accept and not accept(evt):
+                continue
 
-                block_number = evt["blockNumber"]
+            block_number = evt["blockNumber"]
 
-                # Get UTC time when this event happened (block mined timestamp)
-                # from our in-memory cache
-                block_when = get_block_when(block_number)
+            # Get UTC time when this event happened (block mined timestamp)
+            # from our in-memory cache
+            block_when = get_block_when(block_number)
 
-                logger.debug("Processing event %s, block:%d count:%d", evt["event"], evt["blockNumber"])
-                processed = self.state.process_event(block_when, evt)
-                all_processed.append(processed)
+            logger.debug("Processing event %s, block:%d count:%d", evt["event"], evt["blockNumber"])
+            processed = self.state.process_event(block_when, evt)
+            all_processed.append(processed)
 
         end_block_timestamp = get_block_when(end_block)
-        return end_block, end_block_timestamp, all_processed
+        return end_block, end_block_timestamp, all_processed, logs_found
 
     def estimate_next_chunk_size(self, current_chuck_size: int, event_found_count: int):
         """Try to figure out optimal chunk size
@@ -287,7 +298,7 @@ class EventScanner:
                 current_block, estimated_end_block, chunk_size, last_scan_duration, last_logs_found)
 
             start = time.time()
-            actual_end_block, end_block_timestamp, new_entries = self.scan_chunk(current_block, estimated_end_block)
+            actual_end_block, end_block_timestamp, new_entries, last_logs_found = self.scan_chunk(current_block, estimated_end_block)
 
             # Where does our current chunk scan ends - are we out of chain yet?
             current_end = actual_end_block
@@ -299,12 +310,15 @@ class EventScanner:
             if progress_callback:
                 progress_callback(start_block, end_block, current_block, end_block_timestamp, chunk_size, len(new_entries))
 
-            # Try to guess how many blocks to fetch over `eth_getLogs` API next time
-            chunk_size = self.estimate_next_chunk_size(chunk_size, len(new_entries))
+            # Try to guess how many blocks to fetch over `eth_getLogs` API next time,
+            # by what the node had to return, not by what the filters kept
+            chunk_size = self.estimate_next_chunk_size(chunk_size, last_logs_found)
 
             # Set where the next chunk starts
             current_block = current_end + 1
             total_chunks_scanned += 1
+            if end_block_timestamp:
+                self.state.process_block_timestamp(current_end, end_block_timestamp)
             self.state.end_chunk(current_end)
 
         return all_processed, total_chunks_scanned
@@ -353,25 +367,27 @@ def _retry_web3_call(func, start_block, end_block, retries, delay) -> Tuple[int,
 
 def _fetch_events_for_all_contracts(
         web3,
-        event,
-        argument_filters: dict,
+        event_abis: Dict[Tuple[str, bytes], dict],
+        addresses: List[str],
+        topics: List[bytes],
         from_block: int,
-        to_block: int) -> Iterable:
-    """Get events using eth_getLogs API.
+        to_block: int) -> Tuple[int, List]:
+    """Get events of several contracts using a single eth_getLogs call.
 
     This method is detached from any contract instance.
 
     This is a stateless method, as opposed to createFilter.
     It can be safely called against nodes which do not provide `eth_newFilter` API, like Infura.
+
+    :param event_abis: Event ABI by (lowercase contract address, event topic), used to decode each log
+    :param addresses: Contract addresses we ask logs for
+    :param topics: Event topics we ask logs for, any of them matches
+    :return: tuple(number of raw logs returned, decoded events)
     """
 
     if from_block is None:
         raise TypeError("Missing mandatory keyword argument to getLogs: fromBlock")
 
-    # Currently no way to poke this using a public Web3.py API.
-    # This will return raw underlying ABI JSON object for the event
-    abi = event._get_event_abi()
-
     # Depending on the Solidity version used to compile
     # the contract that uses the ABI,
     # it might have Solidity ABI encoding v1 or v2.
@@ -379,20 +395,16 @@ def _fetch_events_for_all_contracts(
     # More information here https://eth-abi.readthedocs.io/en/latest/index.html
     codec: ABICodec = web3.codec
 
-    # Here we need to poke a bit into Web3 internals, as this
-    # functionality is not exposed by default.
-    # Construct JSON-RPC raw filter presentation based on human readable Python descriptions
-    # Namely, convert event names to their keccak signatures
-    # More information here:
-    # https://github.com/ethereum/web3.py/blob/e176ce0793dafdd0573acc8d4b76425b6eb604ca/web3/_utils/filters.py#L71
-    data_filter_set, event_filter_params = construct_event_filter_params(
-        abi,
-        codec,
-        address=argument_filters.get("address"),
-        argument_filters=argument_filters,
-        fromBlock=from_block,
-        toBlock=to_block
-    )
+    # A list of addresses matches a log of any of them,
+    # a list in the first topic position matches any of the event signatures.
+    # Both are ANDed, so this may return events of one contract with the signature of another,
+    # these are dropped below.
+    event_filter_params = {
+        "address": [Web3.toChecksumAddress(address) for address in addresses],
+        "topics": [[Web3.toHex(topic) for topic in topics]],
+        "fromBlock": from_block,
+        "toBlock": to_block,
+    }
 
     logger.debug("Querying eth_getLogs with the following parameters: %s", event_filter_params)
 
@@ -403,6 +415,9 @@ def _fetch_events_for_all_contracts(
     # Convert raw binary data to Python proxy objects as described by ABI
     all_events = []
     for log in logs:
+        abi = event_abis.get((log["address"].lower(), bytes(log["topics"][0])))
+        if abi is None:
+            continue
         # Convert raw JSON-RPC log result to human readable event by using ABI data
         # More information how processLog works here
         # https://github.com/ethereum/web3.py/blob/fbaf1ad11b0c7fac09ba34baff2c256cffe0a148/web3/_utils/events.py#L200
@@ -410,7 +425,7 @@ def _fetch_events_for_all_contracts(
         # Note: This was originally yield,
         # but deferring the timeout exception caused the throttle logic not to work
         all_events.append(evt)
-    return all_events
+    return len(logs), all_events
 
 
 
@@ -423,6 +438,7 @@ if __name__ == "__main__":
     # The resulting JSON state file is 2.9 MB.
     import sys
     import json
+    import calendar
     from hexbytes import HexBytes
     from web3.providers.rpc import HTTPProvider
 
@@ -430,6 +446,10 @@ if __name__ == "__main__":
     # https://pypi.org/project/tqdm/
     from tqdm import tqdm
 
+    HOPR_CHANNELS_ADDRESS = "0xD2F008718EEdD7aF7E9a466F5D68bb77D03B8F7A"
+    # wxHOPR, the token channels are funded with
+    HOPR_TOKEN_ADDRESS = os.environ.get("HOPR_TOKEN_ADDRESS", "0xD4fdec44DB9D44B8f2b6d529620f9C0C7066A2c1")
+
     class HexJsonEncoder(json.JSONEncoder):
         def default(self, obj):
             if isinstance(obj, HexBytes):
@@ -438,6 +458,18 @@ if __name__ == "__main__":
                 return Web3.toHex(obj)
             return super().default(obj)
 
+    def stringify_uints(value):
+        """uint256 event arguments as decimal strings.
+
+        JSON numbers beyond 2**53 lose precision when the graph API parses the state file,
+        amounts are converted to fixed-point values from the exact strings instead, see `fixed_point.py`.
+        """
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value)
+        if isinstance(value, (list, tuple)):
+            return [stringify_uints(v) for v in value]
+        return value
+
     class JSONifiedState(EventScannerState):
         """Store the state of scanned blocks and all events.
 
@@ -448,31 +480,96 @@ if __name__ == "__main__":
         def __init__(self):
             self.state = None
             self.fname = "hopr_channels_events.json"
+            # Change feed of everything scanned since the last save,
+            # tailed by the graph API and the dashboard to pick up new blocks without a restart
+            self.feed_fname = "hopr_channels_feed.jsonl"
             # How many second ago we saved the JSON file
             self.last_save = 0
+            # First block, blocks with events and block timestamps of the chunk being scanned
+            self.chunk_start = None
+            self.chunk_blocks = set()
+            self.chunk_timestamps = []
 
         def reset(self):
             """Create initial state of nothing scanned."""
             self.state = {
                 "last_scanned_block": 0,
                 "blocks": {},
+                # Sequence number of the last change feed record, consumers skip the records
+                # already included in this file and reload it if they missed some
+                "feed_seq": 0,
+                # Two ascending arrays, UNIX timestamps of every block with events and of chunk ends
+                "block_timestamps": {"blocks": [], "timestamps": []},
             }
 
         def restore(self):
             """Restore the last scan state from a file."""
             try:
                 self.state = json.load(open(self.fname, "rt"))
+                # JSON object keys are strings, new blocks are keyed by int
+                self.state["blocks"] = {int(k): v for k, v in self.state["blocks"].items()}
+                self.state.setdefault("block_timestamps", {"blocks": [], "timestamps": []})
                 print(f"Restored the state, previously {self.state['last_scanned_block']} blocks have been scanned")
             except (IOError, json.decoder.JSONDecodeError):
                 print("State starting from scratch")
                 self.reset()
+            # A run stopped before it saved leaves its records in the feed, readers may have applied
+            # them already, so numbering continues after them rather than reusing their numbers
+            self.state["feed_seq"] = max(self.state.get("feed_seq", 0), self.last_feed_seq())
+
+        def last_feed_seq(self) -> int:
+            """Number of the last complete record in the change feed, 0 without one.
+
+            A record cut short by a crash is ended with a newline, readers skip it as undecodable
+            and the next record takes over its number.
+            """
+            seq = 0
+            try:
+                with open(self.feed_fname, "rt") as f:
+                    lines = f.read().split("\n")
+            except IOError:
+                return seq
+            if lines[-1]:
+                with open(self.feed_fname, "at") as f:
+                    f.write("\n")
+            for line in lines:
+                try:
+                    seq = max(seq, json.loads(line).get("seq", 0))
+                except json.decoder.JSONDecodeError:
+                    pass
+            return seq
 
         def save(self):
-            """Save everything we have scanned so far in a file."""
-            with open(self.fname, "wt") as f:
+            """Save everything we have scanned so far in a file.
+
+            The file is replaced atomically, so readers never see a partial state.
+            The change feed is started over, as the saved file now contains all of it.
+            """
+            tmp_fname = self.fname + ".tmp"
+            with open(tmp_fname, "wt") as f:
                 json.dump(self.state, f, cls=HexJsonEncoder)
+            os.replace(tmp_fname, self.fname)
+            if os.path.exists(self.feed_fname):
+                os.remove(self.feed_fname)
             self.last_save = time.time()
 
+        def record_block_timestamp(self, block_number: int, block_when: datetime.datetime):
+            """Remember when a block was mined, blocks arrive in ascending order."""
+            block_timestamps = self.state["block_timestamps"]
+            if block_timestamps["blocks"] and block_number <= block_timestamps["blocks"][-1]:
+                return
+            timestamp = calendar.timegm(block_when.utctimetuple())
+            block_timestamps["blocks"].append(block_number)
+            block_timestamps["timestamps"].append(timestamp)
+            self.chunk_timestamps.append([block_number, timestamp])
+
+        def append_feed(self, record: dict):
+            """Append one JSON line to the change feed."""
+            self.state["feed_seq"] = self.state.get("feed_seq", 0) + 1
+            record["seq"] = self.state["feed_seq"]
+            with open(self.feed_fname, "at") as f:
+                f.write(json.dumps(record, cls=HexJsonEncoder) + "\n")
+
         #
         # EventScannerState methods implemented below
         #
@@ -483,18 +580,37 @@ if __name__ == "__main__":
 
         def delete_data(self, since_block):
             """Remove potentially reorganised blocks from the scan data."""
-            for block_num in range(since_block, self.get_last_scanned_block()):
+            for block_num in range(since_block, self.get_last_scanned_block() + 1):
                 if block_num in self.state["blocks"]:
                     del self.state["blocks"][block_num]
+            block_timestamps = self.state["block_timestamps"]
+            while block_timestamps["blocks"] and block_timestamps["blocks"][-1] >= since_block:
+                block_timestamps["blocks"].pop()
+                block_timestamps["timestamps"].pop()
+            self.append_feed({"type": "delete", "since_block": since_block})
 
         def start_chunk(self, block_number, chunk_size):
-            pass
+            self.chunk_start = block_number
+            self.chunk_blocks = set()
+            self.chunk_timestamps = []
+
+        def process_block_timestamp(self, block_number, block_when):
+            self.record_block_timestamp(block_number, block_when)
 
         def end_chunk(self, block_number):
             """Save at the end of each block, so we can resume in the case of a crash or CTRL+C"""
             # Next time the scanner is started we will resume from this block
             self.state["last_scanned_block"] = block_number
 
+            # Publish the chunk, consumers replace everything they have from `from_block` onwards with it
+            self.append_feed({
+                "type": "chunk",
+                "from_block": self.chunk_start,
+                "to_block": block_number,
+                "blocks": {b: self.state["blocks"][b] for b in sorted(self.chunk_blocks)},
+                "timestamps": self.chunk_timestamps,
+            })
+
             # Save the database file for every minute
             if time.time() - self.last_save > 60:
                 self.save()
@@ -511,7 +627,11 @@ if __name__ == "__main__":
             block_number = event.blockNumber
 
             e = dict(event)
-            e['args'] = dict(e['args'])
+            e['args'] = {name: stringify_uints(value) for name, value in e['args'].items()}
+
+            self.chunk_blocks.add(block_number)
+            if block_when:
+                self.record_block_timestamp(block_number, block_when)
 
             # Create empty dict as the block that contains all transactions by txhash
             if block_number not in self.state["blocks"]:
@@ -551,22 +671,27 @@ if __name__ == "__main__":
 
         web3 = Web3(provider)
 
-        abi = None
         with open(os.path.join('contracts', 'HoprChannels.abi')) as f:
-            abi = json.load(f)
-        HoprChannels = web3.eth.contract(abi=abi)
+            HoprChannels = web3.eth.contract(address=HOPR_CHANNELS_ADDRESS, abi=json.load(f))
+        with open(os.path.join('contracts', 'HoprToken.abi')) as f:
+            HoprToken = web3.eth.contract(address=HOPR_TOKEN_ADDRESS, abi=json.load(f))
+
+        # Only token transfers and approvals into and out of the channels contract are of interest,
+        # eth_getLogs cannot filter for these in the same call as the channel events
+        def _channels_token_flow(event):
+            args = event["args"]
+            counterparties = (args.get("from"), args.get("to"), args.get("owner"), args.get("spender"))
+            return any(a is not None and a.lower() == HOPR_CHANNELS_ADDRESS.lower() for a in counterparties)
 
         # Restore/create our persistent state
         state = JSONifiedState()
         state.restore()
 
-        # chain_id: int, web3: Web3, abi: dict, state: EventScannerState, events: List, filters: {}, max_chunk_scan_size: int=10000
         scanner = EventScanner(
             web3=web3,
-            contract=HoprChannels,
             state=state,
-            events=[e for e in HoprChannels.events],
-            filters={"address": '0xD2F008718EEdD7aF7E9a466F5D68bb77D03B8F7A'},
+            events=[e for e in HoprChannels.events] + [HoprToken.events.Transfer, HoprToken.events.Approval],
+            filters={HOPR_TOKEN_ADDRESS: _channels_token_flow},
             # How many maximum blocks at the time we request from JSON-RPC
             # and we are unlikely to exceed the response size limit of the JSON-RPC server
             max_chunk_scan_size=10000
@@ -605,6 +730,6 @@ if __name__ == "__main__":
 
         state.save()
         duration = time.time() - start
-        print(f"Scanned total {len(result)} Transfer events, in {duration} seconds, total {total_chunks_scanned} chunk scans performed")
+        print(f"Scanned total {len(result)} events, in {duration} seconds, total {total_chunks_scanned} chunk scans performed")
 
     run()
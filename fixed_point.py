@@ -0,0 +1,61 @@
+"""Fixed-point token amounts shared by the graph layer, the snapshot engine and the dashboard.
+
+HOPR amounts are uint256 wei values with 18 decimals on chain. Everywhere past the
+event scanner they are integers counting `10**-PRECISION` HOPR, which fit an int64
+for any amount up to the total token supply. Derived values use the same scale:
+
+    stake      = 1 + sum of the balances of the outgoing channels
+    weight     = isqrt(dest_stake * balance * SCALE // source_stake)
+    importance = sum of the weights of the outgoing channels * stake // SCALE
+
+Every step is integer arithmetic rounding down, so the graph API (`api/app.ts`, with
+bigint) and the Python code produce exactly the same values. Columns of these values
+are int64 typed arrays with `MISSING` where the graph layer has no value.
+
+The scale is 10**-6 HOPR, not wei: an int64 of wei only holds about 9.2 HOPR. The
+replay engines (`createNetwork` in the graph API, `hopr_network.NetworkReplay`) keep
+one arbitrary-precision integer per value instead of int64 columns, as
+`dest_stake * balance * SCALE` overflows an int64. Values are int64 from the compact
+snapshot onwards, see `wire_format.py`.
+"""
+
+import math
+from array import array
+from typing import Iterable, Optional
+
+TOKEN_DECIMALS = 18
+PRECISION = 6
+SCALE = 10 ** PRECISION
+WEI_PER_UNIT = 10 ** (TOKEN_DECIMALS - PRECISION)
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+MISSING = INT64_MIN
+
+
+def from_wei(wei) -> int:
+    """Fixed-point value of a wei amount, an int or a decimal string as written by the event scanner."""
+    value = int(wei) // WEI_PER_UNIT
+    if not INT64_MIN < value <= INT64_MAX:
+        raise OverflowError(f"{wei} wei does not fit an int64 with {PRECISION} decimals")
+    return value
+
+
+def to_tokens(value: Optional[int]) -> Optional[float]:
+    """Fixed-point value in HOPR, for display only."""
+    if value is None or value == MISSING:
+        return None
+    return value / SCALE
+
+
+def channel_weight(source_stake: int, dest_stake: int, balance: int) -> int:
+    return math.isqrt(dest_stake * balance * SCALE // source_stake)
+
+
+def importance_score(stake: int, total_weight: int) -> int:
+    return total_weight * stake // SCALE
+
+
+def fixed_array(values: Iterable[Optional[int]]) -> array:
+    """int64 column of fixed-point values, `None` becomes `MISSING`."""
+    return array("q", [MISSING if value is None else value for value in values])
@@ -0,0 +1,729 @@
+"""Replay HOPR channel events into network snapshots.
+
+This is the Python counterpart of the graph layer in `api/app.ts`: it reads the
+state file written by `event_scanner.py` and rebuilds the same nodes, channels,
+stakes, weights and importance scores at any block height. All amounts are
+fixed-point integers, see `fixed_point.py`.
+"""
+
+import json
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fixed_point import channel_weight, from_wei, importance_score
+
+
+class HoprEvent:
+    ANNOUNCEMENT = "Announcement"
+    CHANNEL_UPDATED = "ChannelUpdated"
+    CHANNEL_OPENED = "ChannelOpened"
+    CHANNEL_FUNDED = "ChannelFunded"
+    CHANNEL_CLOSURE_INITIATED = "ChannelClosureInitiated"
+    CHANNEL_CLOSURE_FINALIZED = "ChannelClosureFinalized"
+
+
+class HoprChannel:
+    def __init__(self, source: str, dest: str, balance: Optional[int] = None):
+        self.source = source
+        self.dest = dest
+        self.balance = balance
+        self.weight: Optional[int] = None
+
+
+class HoprNode:
+    def __init__(self, account: str, public_key: Optional[str] = None):
+        self.account = account
+        self.public_key = public_key
+        self.outgoing_channels = []
+        self.stake: Optional[int] = None
+        self.importance: Optional[int] = None
+
+
+class HoprNetwork:
+    """Network topology at a single block height.
+
+    Values that are NaN in the graph layer (unfunded channels, nodes without
+    outgoing channels) are `None` here.
+    """
+
+    def __init__(self, block: int, nodes: Dict[str, HoprNode], channels: Dict[str, HoprChannel]):
+        self.block = block
+        self.nodes = nodes
+        self.channels = channels
+
+    def connected_nodes(self) -> Dict[str, HoprNode]:
+        """Nodes with at least one channel open, the ones the dashboard renders.
+
+        Channel endpoints that never announced themselves are included without a stake
+        or importance score, like in the compact format of the graph API.
+        """
+        connected = {}
+        for channel in self.channels.values():
+            for account in (channel.source, channel.dest):
+                if account not in connected:
+                    connected[account] = self.nodes.get(account) or HoprNode(account)
+        return connected
+
+
+def channel_key(source: str, dest: str) -> str:
+    return f"{source}:{dest}"
+
+
+def calculate_stake(outgoing_channels) -> Optional[int]:
+    stake = 1
+    for channel in outgoing_channels:
+        if channel.balance is None:
+            return None
+        stake += channel.balance
+    return stake
+
+
+def load_state(fname: str) -> dict:
+    """Load the JSON state file written by the event scanner."""
+    with open(fname, "rt") as f:
+        return json.load(f)
+
+
+def iter_events(state: dict) -> Iterator[Tuple[int, dict]]:
+    """Iterate over all scanned events in chain order.
+
+    :return: (block number, event) tuples, ordered by block number and log index
+    """
+    for block in sorted(state["blocks"], key=int):
+        block_events = []
+        for txhash, logs in state["blocks"][block].items():
+            block_events.extend(logs.values())
+        block_events.sort(key=lambda e: e["logIndex"])
+        for event in block_events:
+            yield int(block), event
+
+
+class NetworkReplay:
+    """Incrementally apply events and build snapshots on demand.
+
+    Only the announced nodes and open channel balances are kept between events,
+    the derived stake, weight and importance values are computed by `snapshot()`.
+    """
+
+    def __init__(self):
+        self.block = 0
+        self.public_keys: Dict[str, str] = {}
+        self.balances: Dict[str, Optional[int]] = {}
+
+    def stake(self, account: str) -> Optional[int]:
+        """Stake of a node from the balances of its open outgoing channels."""
+        outgoing_channels = [
+            HoprChannel(*key.split(":"), balance)
+            for key, balance in self.balances.items()
+            if key.startswith(account + ":")
+        ]
+        if not outgoing_channels:
+            return None
+        return calculate_stake(outgoing_channels)
+
+    def apply(self, block: int, event: dict) -> bool:
+        """Apply a single event.
+
+        :return: True if the event changed the network topology or balances
+        """
+        self.block = block
+        args = event["args"]
+        name = event["event"]
+
+        if name == HoprEvent.ANNOUNCEMENT:
+            account = args["account"].lower()
+            if account in self.public_keys:
+                return False
+            self.public_keys[account] = args["publicKey"]
+            return True
+
+        if name not in (HoprEvent.CHANNEL_OPENED, HoprEvent.CHANNEL_FUNDED,
+                        HoprEvent.CHANNEL_UPDATED, HoprEvent.CHANNEL_CLOSURE_FINALIZED):
+            return False
+
+        key = channel_key(args["source"].lower(), args["destination"].lower())
+        if name == HoprEvent.CHANNEL_OPENED:
+            if key in self.balances:
+                return False
+            self.balances[key] = None
+        elif key not in self.balances:
+            # channel not previously seen
+            return False
+        elif name == HoprEvent.CHANNEL_FUNDED:
+            self.balances[key] = from_wei(args["amount"])
+        elif name == HoprEvent.CHANNEL_UPDATED:
+            self.balances[key] = from_wei(args["newState"][0])
+        else:
+            del self.balances[key]
+        return True
+
+    def snapshot(self) -> HoprNetwork:
+        """Build the network at the last applied block, mirrors `createNetwork` in the graph layer."""
+        channels = {}
+        outgoing_channels = {}
+        for key, balance in self.balances.items():
+            source, dest = key.split(":")
+            channel = HoprChannel(source, dest, balance)
+            channels[key] = channel
+            outgoing_channels.setdefault(source, []).append(channel)
+
+        nodes = {}
+        for account, public_key in self.public_keys.items():
+            node = HoprNode(account, public_key)
+            if account in outgoing_channels:
+                node.outgoing_channels = outgoing_channels[account]
+                node.stake = calculate_stake(node.outgoing_channels)
+            nodes[account] = node
+
+        for node in nodes.values():
+            total_weight = 0
+            for channel in node.outgoing_channels:
+                other_node = nodes.get(channel.dest)
+                if other_node is None or other_node.stake is None or node.stake is None or channel.balance is None:
+                    total_weight = None
+                    continue
+                channel.weight = channel_weight(node.stake, other_node.stake, channel.balance)
+                if total_weight is not None:
+                    total_weight += channel.weight
+            if total_weight is not None and node.stake is not None:
+                node.importance = importance_score(node.stake, total_weight)
+
+        return HoprNetwork(self.block, nodes, channels)
+
+
+def iter_snapshots(events: Iterable[Tuple[int, dict]], heights: Iterable[int]) -> Iterator[Tuple[int, HoprNetwork]]:
+    """Replay events once and yield the network at each of the requested heights.
+
+    The snapshot at a height includes all events mined at or before that block.
+    A snapshot is only rebuilt if events changed the network since the previous height,
+    otherwise the previous one is yielded again.
+
+    :param events: (block number, event) tuples in chain order, see `iter_events`
+    :param heights: Block heights in ascending order
+
+    :return: (height, network) tuples
+    """
+    replay = NetworkReplay()
+    events = iter(events)
+    pending = next(events, None)
+    network = None
+    changed = True
+
+    for height in heights:
+        while pending is not None and pending[0] <= height:
+            changed |= replay.apply(*pending)
+            pending = next(events, None)
+        if changed or network is None:
+            network = replay.snapshot()
+            changed = False
+        yield height, network
+
+
+def event_keys(event: dict) -> List[str]:
+    """Addresses and channel keys an event belongs to in the history index."""
+    args = event["args"]
+    if event["event"] == HoprEvent.ANNOUNCEMENT:
+        return [args["account"].lower()]
+    if "source" in args and "destination" in args:
+        source, dest = args["source"].lower(), args["destination"].lower()
+        return [source, dest, channel_key(source, dest)]
+    # token transfers and approvals into and out of the channels contract
+    return [args[name].lower() for name in ("from", "to", "owner", "spender") if name in args]
+
+
+class EventStore:
+    """All scanned events as one flat list in chain order.
+
+    An event is referred to by its position in the list. Besides the block number of
+    every position, the store keeps an index from node addresses and channel keys
+    (`source:dest`) to the sorted positions of their events. Both are built in one pass
+    over the scanner state and updated in place as new blocks are appended.
+
+    For looking up the network at a block height without a replay, it also keeps the
+    channel keys of every address, the positions of the events opening and closing each
+    channel, and the block every node was first announced in.
+    """
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self.blocks = array("L")
+        self.positions: Dict[str, array] = {}
+        # channel keys of every address, with the address at the other end
+        self.outgoing: Dict[str, Dict[str, str]] = {}
+        self.incoming: Dict[str, Dict[str, str]] = {}
+        self.lifecycle: Dict[str, array] = {}
+        self.announced: Dict[str, int] = {}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "EventStore":
+        store = cls()
+        for block, event in iter_events(state):
+            store.append(block, event)
+        return store
+
+    @property
+    def last_block(self) -> int:
+        return self.blocks[-1] if self.blocks else 0
+
+    def bisect_block(self, block: int) -> int:
+        """Position of the first event mined after `block`."""
+        return bisect_right(self.blocks, block)
+
+    def bisect_positions(self, positions: array, block: int) -> int:
+        """Index of the first of some sorted positions mined after `block`."""
+        return bisect_left(positions, self.bisect_block(block))
+
+    def truncate(self, since_block: int):
+        """Drop all events mined at or after `since_block`, e.g. after a chain reorganisation."""
+        cut = self.bisect_block(since_block - 1)
+        if cut == len(self.events):
+            return
+        del self.events[cut:]
+        del self.blocks[cut:]
+        for index in (self.positions, self.lifecycle):
+            for key in list(index):
+                positions = index[key]
+                while positions and positions[-1] >= cut:
+                    positions.pop()
+                if not positions:
+                    del index[key]
+        for channels in (self.outgoing, self.incoming):
+            for account in list(channels):
+                channels[account] = {key: peer for key, peer in channels[account].items() if key in self.positions}
+                if not channels[account]:
+                    del channels[account]
+        self.announced = {account: block for account, block in self.announced.items() if block < since_block}
+
+    def apply_feed_record(self, record: dict):
+        """Apply a change feed record of the event scanner, see `FeedReader`."""
+        if record["type"] == "delete":
+            self.truncate(record["since_block"])
+        elif record["type"] == "chunk":
+            self.truncate(record["from_block"])
+            for block, event in iter_events(record):
+                self.append(block, event)
+
+    def append(self, block: int, event: dict):
+        """Add an event mined after every event already in the store."""
+        assert block >= self.last_block, "Events must be appended in chain order"
+        position = len(self.events)
+        self.events.append(event)
+        self.blocks.append(block)
+        args = event["args"]
+        name = event["event"]
+        if name == HoprEvent.ANNOUNCEMENT:
+            self.announced.setdefault(args["account"].lower(), block)
+        elif "source" in args and "destination" in args:
+            source, dest = args["source"].lower(), args["destination"].lower()
+            key = channel_key(source, dest)
+            if key not in self.positions:
+                self.outgoing.setdefault(source, {})[key] = dest
+                self.incoming.setdefault(dest, {})[key] = source
+            if name in (HoprEvent.CHANNEL_OPENED, HoprEvent.CHANNEL_CLOSURE_FINALIZED):
+                self.lifecycle.setdefault(key, array("L")).append(position)
+        for key in event_keys(event):
+            if key not in self.positions:
+                self.positions[key] = array("L")
+            self.positions[key].append(position)
+
+    def history(self, key: str, until_block: Optional[int] = None) -> array:
+        """Positions of all events of an address or a channel, up to and including `until_block`.
+
+        Binary search over the sorted positions, so the cost is logarithmic in the
+        number of events of that key.
+        """
+        positions = self.positions.get(key.lower(), array("L"))
+        if until_block is None:
+            return positions
+        return positions[:self.bisect_positions(positions, until_block)]
+
+
+def node_stake_history(store: EventStore, account: str, until_block: Optional[int] = None) -> List[Tuple[int, Optional[int]]]:
+    """Stake of a node after each of its events.
+
+    Only the events of the node itself are replayed, these include every balance
+    change of its outgoing channels.
+
+    :return: (block number, stake) tuples
+    """
+    account = account.lower()
+    replay = NetworkReplay()
+    history = []
+    for position in store.history(account, until_block):
+        block = store.blocks[position]
+        replay.apply(block, store.events[position])
+        history.append((block, replay.stake(account)))
+    return history
+
+
+def channel_balance_history(store: EventStore, source: str, dest: str,
+                            until_block: Optional[int] = None) -> List[Tuple[int, Optional[int]]]:
+    """Balance of a channel after each of its events, `None` while closed or unfunded.
+
+    :return: (block number, balance) tuples
+    """
+    key = channel_key(source.lower(), dest.lower())
+    replay = NetworkReplay()
+    history = []
+    for position in store.history(key, until_block):
+        block = store.blocks[position]
+        replay.apply(block, store.events[position])
+        history.append((block, replay.balances.get(key)))
+    return history
+
+
+class FeedReader:
+    """Tail the change feed the event scanner appends to after every scanned chunk.
+
+    Every line is a JSON record, either a `chunk` with all events from `from_block`
+    to `to_block` or a `delete` of everything since `since_block` after a chain
+    reorganisation. The scanner starts a new feed file whenever it saves its full
+    state, the old file is read to the end before switching over.
+
+    Records are numbered, the state file has the number of the last record it
+    includes. Open the feed before reading the state file and set `seq` from it:
+    records the state file already has are skipped, and `gap` is set if records
+    are missing, in which case the state file has to be read again.
+    """
+
+    def __init__(self, fname: str):
+        self.fname = fname
+        self.f = None
+        self.buffer = ""
+        # Sequence number of the last record returned, None if the state file predates them
+        self.seq: Optional[int] = None
+        self.gap = False
+
+    def open(self) -> bool:
+        try:
+            self.f = open(self.fname, "rt")
+        except FileNotFoundError:
+            return False
+        self.buffer = ""
+        return True
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def _rotated(self) -> bool:
+        try:
+            return os.stat(self.fname).st_ino != os.fstat(self.f.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def poll(self) -> List[dict]:
+        """Records appended since the last poll."""
+        if self.f is None and not self.open():
+            return []
+        # Check before reading, the old file gets no more writes once it has been replaced
+        rotated = self._rotated()
+        records = self._read()
+        if rotated:
+            # Left closed if the new file is already gone again, the next poll opens it
+            self.close()
+            if self.open():
+                records += self._read()
+        return self._in_sequence(records)
+
+    def _in_sequence(self, records: List[dict]) -> List[dict]:
+        fresh = []
+        for record in records:
+            seq = record.get("seq")
+            if seq is None or self.seq is None:
+                fresh.append(record)
+                self.seq = self.seq if seq is None else seq
+            elif seq > self.seq + 1:
+                self.gap = True
+                break
+            elif seq == self.seq + 1:
+                fresh.append(record)
+                self.seq = seq
+        return fresh
+
+    def _read(self) -> List[dict]:
+        self.buffer += self.f.read()
+        *lines, self.buffer = self.buffer.split("\n")
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.decoder.JSONDecodeError:
+                # Cut short by a scanner crash, the scanner numbers the next record as if it never was
+                continue
+        return records
+
+
+class BlockTimeIndex:
+    """When blocks were mined, from the timestamps the event scanner persisted.
+
+    The scanner keeps the timestamp of every block with events plus the last block
+    of every scanned chunk. Anything in between is linearly interpolated, so mapping
+    between block numbers and time needs no JSON-RPC calls.
+    """
+
+    def __init__(self):
+        self.blocks = array("L")
+        self.timestamps = array("L")
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BlockTimeIndex":
+        index = cls()
+        block_timestamps = state.get("block_timestamps", {"blocks": [], "timestamps": []})
+        for block, timestamp in zip(block_timestamps["blocks"], block_timestamps["timestamps"]):
+            index.append(block, timestamp)
+        return index
+
+    def append(self, block: int, timestamp: int):
+        if self.blocks and block <= self.blocks[-1]:
+            return
+        self.blocks.append(block)
+        self.timestamps.append(timestamp)
+
+    def truncate(self, since_block: int):
+        while self.blocks and self.blocks[-1] >= since_block:
+            self.blocks.pop()
+            self.timestamps.pop()
+
+    def apply_feed_record(self, record: dict):
+        """Apply a change feed record of the event scanner, see `FeedReader`."""
+        if record["type"] == "delete":
+            self.truncate(record["since_block"])
+        elif record["type"] == "chunk":
+            self.truncate(record["from_block"])
+            for block, timestamp in record.get("timestamps", []):
+                self.append(block, timestamp)
+
+    @staticmethod
+    def _interpolate(x, xs: array, ys: array) -> Optional[float]:
+        # Binary search for the anchors around x, extrapolate from the first or last two outside of them
+        if not xs:
+            return None
+        if len(xs) == 1:
+            return ys[0] if x == xs[0] else None
+        lo, hi = 0, len(xs)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if xs[mid] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(xs) and xs[lo] == x:
+            return ys[lo]
+        right = min(max(lo, 1), len(xs) - 1)
+        left = right - 1
+        if xs[right] == xs[left]:
+            return ys[left]
+        return ys[left] + (x - xs[left]) * (ys[right] - ys[left]) / (xs[right] - xs[left])
+
+    def timestamp_at(self, block: int) -> Optional[float]:
+        """UNIX timestamp a block was mined at, `None` without any anchors."""
+        return self._interpolate(block, self.blocks, self.timestamps)
+
+    def block_at(self, timestamp: float) -> Optional[int]:
+        """Last block mined at or before a UNIX timestamp, `None` without any anchors."""
+        block = self._interpolate(timestamp, self.timestamps, self.blocks)
+        return None if block is None else int(block)
+
+
+class RangeDiff:
+    """What changed in the network between two block heights.
+
+    Channels are `source:dest` keys, deltas are (value at the first height, value at the second height).
+    """
+
+    def __init__(self, from_block: int, to_block: int):
+        self.from_block = from_block
+        self.to_block = to_block
+        self.opened: List[str] = []
+        self.closed: List[str] = []
+        self.refunded: List[str] = []
+        self.appeared: List[str] = []
+        self.stake_deltas: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+        self.importance_deltas: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "from_block": self.from_block,
+            "to_block": self.to_block,
+            "opened": self.opened,
+            "closed": self.closed,
+            "refunded": self.refunded,
+            "appeared": self.appeared,
+            "stake_deltas": {a: list(d) for a, d in self.stake_deltas.items()},
+            "importance_deltas": {a: list(d) for a, d in self.importance_deltas.items()},
+        }
+
+
+class _NodeStates:
+    """Channels, stakes and importance scores at block heights, looked up in the history index.
+
+    The state of a channel is read from its own last events and the stake of a node from
+    its outgoing channels, so nothing is replayed and only the channels around the nodes
+    asked about are looked at.
+    """
+
+    def __init__(self, store: EventStore):
+        self.store = store
+        # position of the first event mined after each block height asked about
+        self.cuts: Dict[int, int] = {}
+        self.channels: Dict[Tuple[str, int], Tuple[bool, Optional[int]]] = {}
+        # block heights whose channels are the same as at an earlier one, but for some, see `carry`
+        self.carried: Dict[int, int] = {}
+        self.open_channels: Dict[Tuple[str, int], List[Tuple[str, Optional[int]]]] = {}
+        self.stakes: Dict[Tuple[str, int], Optional[int]] = {}
+
+    def carry(self, from_block: int, to_block: int, changed: Dict[str, Tuple[bool, Optional[int]]]):
+        """Take the channels at `to_block` from `from_block`, except the `changed` ones given as they are then."""
+        self.carried[to_block] = from_block
+        for key, state in changed.items():
+            self.channels[(key, to_block)] = state
+
+    def channel(self, key: str, block: int) -> Tuple[bool, Optional[int]]:
+        """Whether a channel is open at a block height and its balance, as `NetworkReplay.apply` has them."""
+        if (key, block) not in self.channels:
+            if block in self.carried:
+                self.channels[(key, block)] = self.channel(key, self.carried[block])
+            else:
+                self.channels[(key, block)] = self._channel(key, block)
+        return self.channels[(key, block)]
+
+    def _channel(self, key: str, block: int) -> Tuple[bool, Optional[int]]:
+        store = self.store
+        if block not in self.cuts:
+            self.cuts[block] = store.bisect_block(block)
+        cut = self.cuts[block]
+        lifecycle = store.lifecycle.get(key)
+        end = bisect_left(lifecycle, cut) if lifecycle else 0
+        if not end or store.events[lifecycle[end - 1]]["event"] != HoprEvent.CHANNEL_OPENED:
+            return False, None
+        # Opened by the first opening since the last closure, funding before it was ignored
+        while end > 1 and store.events[lifecycle[end - 2]]["event"] == HoprEvent.CHANNEL_OPENED:
+            end -= 1
+        opened_at = lifecycle[end - 1]
+        positions = store.positions[key]
+        for index in reversed(range(bisect_left(positions, cut))):
+            position = positions[index]
+            if position <= opened_at:
+                break
+            event = store.events[position]
+            if event["event"] == HoprEvent.CHANNEL_FUNDED:
+                return True, from_wei(event["args"]["amount"])
+            if event["event"] == HoprEvent.CHANNEL_UPDATED:
+                return True, from_wei(event["args"]["newState"][0])
+        return True, None
+
+    def announced(self, account: str, block: int) -> bool:
+        return self.store.announced.get(account, block + 1) <= block
+
+    def outgoing(self, account: str, block: int) -> List[Tuple[str, Optional[int]]]:
+        """Destination and balance of the open outgoing channels of a node."""
+        if (account, block) not in self.open_channels:
+            channels = []
+            for key, dest in self.store.outgoing.get(account, {}).items():
+                is_open, balance = self.channel(key, block)
+                if is_open:
+                    channels.append((dest, balance))
+            self.open_channels[(account, block)] = channels
+        return self.open_channels[(account, block)]
+
+    def stake(self, account: str, block: int) -> Optional[int]:
+        """Same as `calculate_stake` of the open outgoing channels, `None` without any."""
+        if (account, block) not in self.stakes:
+            balances = [balance for _, balance in self.outgoing(account, block)]
+            stake = None
+            if balances and None not in balances:
+                stake = 1 + sum(balances)
+            self.stakes[(account, block)] = stake
+        return self.stakes[(account, block)]
+
+    def in_neighbours(self, account: str, block: int) -> List[str]:
+        return [source for key, source in self.store.incoming.get(account, {}).items() if self.channel(key, block)[0]]
+
+    def importance(self, account: str, block: int) -> Optional[int]:
+        """Same as the importance score in `NetworkReplay.snapshot`."""
+        stake = self.stake(account, block)
+        if not self.announced(account, block) or stake is None:
+            return None
+        total_weight = 0
+        for dest, balance in self.outgoing(account, block):
+            dest_stake = self.stake(dest, block)
+            if not self.announced(dest, block) or dest_stake is None or balance is None:
+                return None
+            total_weight += channel_weight(stake, dest_stake, balance)
+        return importance_score(stake, total_weight)
+
+
+def diff_range(store: EventStore, from_block: int, to_block: int) -> RangeDiff:
+    """Compare the network at `from_block` with the network at `to_block`.
+
+    Only the events mined in (from_block, to_block] are replayed. Stakes and importance
+    scores at both heights are looked up in the history index for the nodes around them,
+    so the cost follows the activity in the range rather than the size or age of the network.
+    """
+    assert from_block <= to_block
+    diff = RangeDiff(from_block, to_block)
+    states = _NodeStates(store)
+
+    # Dicts as ordered sets, in the order of the events
+    opened, closed, refunded, appeared, touched_accounts = {}, {}, {}, {}, {}
+    # Channels touched in the range, seeded with their balance before it
+    replay = NetworkReplay()
+    seeded = set()
+    for position in range(store.bisect_block(from_block), store.bisect_block(to_block)):
+        block, event = store.blocks[position], store.events[position]
+        args = event["args"]
+        name = event["event"]
+
+        if name == HoprEvent.ANNOUNCEMENT:
+            account = args["account"].lower()
+            if not states.announced(account, from_block):
+                appeared[account] = None
+            continue
+        if "source" not in args or "destination" not in args:
+            continue
+
+        source, dest = args["source"].lower(), args["destination"].lower()
+        key = channel_key(source, dest)
+        touched_accounts[source] = touched_accounts[dest] = None
+        if key not in seeded:
+            seeded.add(key)
+            is_open, balance = states.channel(key, from_block)
+            if is_open:
+                replay.balances[key] = balance
+
+        was_funded = replay.balances.get(key) is not None
+        if not replay.apply(block, event):
+            continue
+        if name == HoprEvent.CHANNEL_OPENED:
+            opened[key] = None
+        elif name == HoprEvent.CHANNEL_CLOSURE_FINALIZED:
+            closed[key] = None
+        elif name == HoprEvent.CHANNEL_FUNDED and was_funded:
+            refunded[key] = None
+    diff.opened, diff.closed, diff.refunded, diff.appeared = list(opened), list(closed), list(refunded), list(appeared)
+    # Channels without events in the range are looked up once for both heights
+    states.carry(from_block, to_block, {key: (key in replay.balances, replay.balances.get(key)) for key in seeded})
+
+    for account in touched_accounts:
+        stakes = (states.stake(account, from_block), states.stake(account, to_block))
+        if stakes[0] != stakes[1]:
+            diff.stake_deltas[account] = stakes
+
+    # Importance depends on the own stake and channels, and on the stake and announcement
+    # of the channel destinations
+    affected = dict(touched_accounts)
+    affected.update(appeared)
+    for account in list(diff.stake_deltas) + diff.appeared:
+        for block in (from_block, to_block):
+            for source in states.in_neighbours(account, block):
+                affected[source] = None
+    for account in affected:
+        importances = (states.importance(account, from_block), states.importance(account, to_block))
+        if importances[0] != importances[1]:
+            diff.importance_deltas[account] = importances
+
+    return diff
@@ -0,0 +1,73 @@
+"""Timing instrumentation for the dashboard callbacks.
+
+Durations are kept per named stage in a bounded window, so the percentiles
+reflect recent slider activity rather than the whole lifetime of the server.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile, `q` between 0 and 100."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+class StageTimings:
+    """Thread safe collection of durations per stage."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.max_samples)
+                self._counts[stage] = 0
+                self._totals[stage] = 0.0
+            self._samples[stage].append(seconds)
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, total and latency percentiles in milliseconds for every stage."""
+        with self._lock:
+            samples = {stage: list(window) for stage, window in self._samples.items()}
+            counts, totals = dict(self._counts), dict(self._totals)
+        return {
+            stage: {
+                "count": counts[stage],
+                "total_ms": totals[stage] * 1000,
+                "p50_ms": percentile(window, 50) * 1000,
+                "p90_ms": percentile(window, 90) * 1000,
+                "p99_ms": percentile(window, 99) * 1000,
+                "max_ms": max(window) * 1000,
+            }
+            for stage, window in samples.items()
+        }
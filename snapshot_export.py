@@ -0,0 +1,154 @@
+"""Export HOPR network snapshots for a range of block heights.
+
+Events are replayed once per worker and every requested height is written as soon
+as it is reached, instead of querying the graph API once per block height. Stakes,
+balances, weights and importance scores are fixed-point integers, see `fixed_point.py`.
+
+    python snapshot_export.py hopr_channels_events.json 20307201 20637852 --stride 1000 --format graphml --out snapshots
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from hopr_network import HoprNetwork, iter_events, iter_snapshots, load_state
+
+
+def _value(value) -> str:
+    return "" if value is None else str(value)
+
+
+def write_edgelist(network: HoprNetwork, f):
+    """Whitespace separated `source target balance weight` lines, missing values are `nan`."""
+    f.write("# source target balance weight\n")
+    for channel in network.channels.values():
+        balance = _value(channel.balance) or "nan"
+        weight = _value(channel.weight) or "nan"
+        f.write(f"{channel.source} {channel.dest} {balance} {weight}\n")
+
+
+def write_graphml(network: HoprNetwork, f):
+    """GraphML with the same node and edge attributes as the cytoscape payload of the graph API."""
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    f.write('  <key id="stake" for="node" attr.name="stake" attr.type="long"/>\n')
+    f.write('  <key id="importance" for="node" attr.name="importance" attr.type="long"/>\n')
+    f.write('  <key id="balance" for="edge" attr.name="balance" attr.type="long"/>\n')
+    f.write('  <key id="weight" for="edge" attr.name="weight" attr.type="long"/>\n')
+    f.write(f'  <graph id="{network.block}" edgedefault="directed">\n')
+    for account, node in network.connected_nodes().items():
+        f.write(f'    <node id="{account}">')
+        if node.stake is not None:
+            f.write(f'<data key="stake">{node.stake}</data>')
+        if node.importance is not None:
+            f.write(f'<data key="importance">{node.importance}</data>')
+        f.write("</node>\n")
+    for key, channel in network.channels.items():
+        f.write(f'    <edge id="{key}" source="{channel.source}" target="{channel.dest}">')
+        if channel.balance is not None:
+            f.write(f'<data key="balance">{channel.balance}</data>')
+        if channel.weight is not None:
+            f.write(f'<data key="weight">{channel.weight}</data>')
+        f.write("</edge>\n")
+    f.write("  </graph>\n")
+    f.write("</graphml>\n")
+
+
+def write_columnar(network: HoprNetwork, f):
+    """One JSON object of parallel columns per snapshot, missing values are `null`."""
+    nodes = network.connected_nodes()
+    channels = network.channels.values()
+    json.dump({
+        "block": network.block,
+        "nodes": {
+            "id": list(nodes),
+            "stake": [n.stake for n in nodes.values()],
+            "importance": [n.importance for n in nodes.values()],
+        },
+        "edges": {
+            "source": [c.source for c in channels],
+            "target": [c.dest for c in channels],
+            "balance": [c.balance for c in channels],
+            "weight": [c.weight for c in channels],
+        },
+    }, f)
+    f.write("\n")
+
+
+WRITERS = {
+    "edgelist": (write_edgelist, "edgelist"),
+    "graphml": (write_graphml, "graphml"),
+    "columnar": (write_columnar, "json"),
+}
+
+
+def export_heights(events_fname: str, heights: List[int], fmt: str, out_dir: str) -> int:
+    """Replay the events file and write a snapshot file for each height.
+
+    :return: Number of snapshots written
+    """
+    writer, extension = WRITERS[fmt]
+    state = load_state(events_fname)
+    written = 0
+    for height, network in iter_snapshots(iter_events(state), heights):
+        network.block = height
+        with open(os.path.join(out_dir, f"{height}.{extension}"), "wt") as f:
+            writer(network, f)
+        written += 1
+    return written
+
+
+def split_heights(heights: List[int], workers: int) -> List[List[int]]:
+    """Split heights into contiguous sub-ranges, one per worker."""
+    size = -(-len(heights) // workers)
+    return [heights[i:i + size] for i in range(0, len(heights), size)]
+
+
+def export(events_fname: str, start_block: int, end_block: int, stride: int, fmt: str, out_dir: str,
+           workers: int = 1) -> int:
+    """Export snapshots at `start_block`, `start_block + stride`, ... up to `end_block` inclusive.
+
+    With more than one worker the block range is split into contiguous sub-ranges,
+    every worker process replays the events up to the end of its own sub-range.
+
+    :return: Number of snapshots written
+    """
+    assert start_block <= end_block
+    assert stride > 0
+    os.makedirs(out_dir, exist_ok=True)
+
+    heights = list(range(start_block, end_block + 1, stride))
+    if workers <= 1:
+        return export_heights(events_fname, heights, fmt, out_dir)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(export_heights, events_fname, sub_range, fmt, out_dir)
+            for sub_range in split_heights(heights, workers)
+        ]
+        return sum(future.result() for future in futures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export HOPR network snapshots for a block range")
+    parser.add_argument("events", help="JSON state file written by event_scanner.py")
+    parser.add_argument("start_block", type=int)
+    parser.add_argument("end_block", type=int)
+    parser.add_argument("--stride", type=int, default=1, help="Blocks between two snapshots")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="edgelist")
+    parser.add_argument("--out", default="snapshots", help="Output directory, one file per block height")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each exports a sub-range")
+    args = parser.parse_args()
+    if args.start_block > args.end_block:
+        parser.error("start_block must not be greater than end_block")
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    start = time.time()
+    count = export(args.events, args.start_block, args.end_block, args.stride, args.format, args.out, args.workers)
+    print(f"Exported {count} snapshots to {args.out} in {time.time() - start:.1f} seconds")
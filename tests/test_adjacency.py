@@ -0,0 +1,53 @@
+import random
+from array import array
+
+from adjacency import AdjacencyIndex
+from fixed_point import fixed_array
+from wire_format import Snapshot
+
+
+def random_snapshot(rng, address_count):
+    # some channel endpoints are left out of the nodes, like nodes that were never announced
+    node_ids = sorted(rng.sample(range(address_count), rng.randint(0, address_count)))
+    edges = {(rng.randrange(address_count), rng.randrange(address_count)) for _ in range(rng.randint(0, 3 * address_count))}
+    edges = [(source, target) for source, target in edges if source != target]
+    rng.shuffle(edges)
+    edge_source, edge_target = zip(*edges) if edges else ((), ())
+    return Snapshot(address_count, array("I", node_ids), fixed_array([1] * len(node_ids)), fixed_array([None] * len(node_ids)),
+                    array("I", edge_source), array("I", edge_target),
+                    fixed_array([1] * len(edges)), fixed_array([1] * len(edges)))
+
+
+def brute_force_neighbourhood(snapshot, address_id, hops):
+    node_ids = list(snapshot.node_ids)
+    if address_id not in node_ids:
+        return [], []
+    edges = list(zip(snapshot.edge_source, snapshot.edge_target))
+    visited = {address_id}
+    for _ in range(hops):
+        reached = set(visited)
+        for source, target in edges:
+            if source in visited:
+                reached.add(target)
+            if target in visited:
+                reached.add(source)
+        visited = reached
+    rows = sorted(row for row, node in enumerate(node_ids) if node in visited)
+    edge_indices = [edge for edge, (source, target) in enumerate(edges) if source in visited and target in visited]
+    return rows, edge_indices
+
+
+def test_neighbourhood_matches_breadth_first_search():
+    rng = random.Random(7)
+    for _ in range(200):
+        snapshot = random_snapshot(rng, rng.randint(1, 12))
+        adjacency = AdjacencyIndex(snapshot)
+        for address_id in range(snapshot.address_count):
+            for hops in range(4):
+                assert adjacency.neighbourhood(address_id, hops) == brute_force_neighbourhood(snapshot, address_id, hops)
+
+
+def test_neighbourhood_of_an_unknown_address_is_empty():
+    snapshot = random_snapshot(random.Random(1), 4)
+    adjacency = AdjacencyIndex(snapshot)
+    assert adjacency.neighbourhood(snapshot.address_count, 2) == ([], [])
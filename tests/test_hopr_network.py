@@ -0,0 +1,227 @@
+import json
+import os
+
+from hopr_network import BlockTimeIndex, EventStore, FeedReader, HoprEvent, diff_range, iter_snapshots
+
+X = "0x" + "11" * 20
+D = "0x" + "dd" * 20
+Y = "0x" + "22" * 20
+HOPR = 10 ** 18
+
+
+def announcement(account):
+    return {"event": HoprEvent.ANNOUNCEMENT, "args": {"account": account, "publicKey": account[2:]}}
+
+
+def channel_opened(source, dest):
+    return {"event": HoprEvent.CHANNEL_OPENED, "args": {"source": source, "destination": dest}}
+
+
+def channel_funded(source, dest, amount):
+    return {"event": HoprEvent.CHANNEL_FUNDED, "args": {"source": source, "destination": dest, "amount": str(amount)}}
+
+
+def store_of(events):
+    store = EventStore()
+    for block, event in events:
+        store.append(block, event)
+    return store
+
+
+def test_diff_range_node_announced_in_range_changes_importance_of_sources():
+    events = [
+        (1, announcement(X)),
+        (2, announcement(Y)),
+        (10, channel_opened(X, D)),
+        (10, channel_opened(D, Y)),
+        (11, channel_funded(X, D, 100 * HOPR)),
+        (12, channel_funded(D, Y, 100 * HOPR)),
+        (20, announcement(D)),
+    ]
+    store = store_of(events)
+
+    diff = diff_range(store, 15, 25)
+
+    assert diff.appeared == [D]
+    assert diff.importance_deltas == {X: (None, 1000000010)}
+
+    (_, before), (_, after) = iter_snapshots(events, [15, 25])
+    for account in (X, D, Y):
+        old = before.nodes[account].importance if account in before.nodes else None
+        new = after.nodes[account].importance
+        assert diff.importance_deltas.get(account, (old, new)) == (old, new)
+
+
+def channel_closed(source, dest):
+    return {"event": HoprEvent.CHANNEL_CLOSURE_FINALIZED, "args": {"source": source, "destination": dest}}
+
+
+def chunk_record(seq, from_block, to_block, events=(), timestamps=()):
+    blocks = {}
+    for log_index, (block, event) in enumerate(events):
+        blocks.setdefault(str(block), {}).setdefault("0x%02x" % block, {})[str(log_index)] = dict(event, logIndex=log_index)
+    return {"type": "chunk", "seq": seq, "from_block": from_block, "to_block": to_block,
+            "blocks": blocks, "timestamps": [list(t) for t in timestamps]}
+
+
+def write_feed(fname, records, mode="at"):
+    with open(fname, mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def seqs(records):
+    return [record["seq"] for record in records]
+
+
+def test_feed_reader_reads_the_old_feed_to_the_end_after_a_rotation(tmp_path):
+    fname = tmp_path / "feed.jsonl"
+    write_feed(fname, [chunk_record(1, 1, 10), chunk_record(2, 11, 20)])
+    reader = FeedReader(str(fname))
+    reader.seq = 0
+    assert seqs(reader.poll()) == [1, 2]
+
+    write_feed(fname, [chunk_record(3, 21, 30)])
+    os.remove(fname)
+    write_feed(fname, [chunk_record(4, 31, 40)])
+    assert seqs(reader.poll()) == [3, 4]
+    assert not reader.gap
+
+    os.remove(fname)
+    write_feed(fname, [chunk_record(5, 41, 50)])
+    assert seqs(reader.poll()) == [5]
+    reader.close()
+
+
+def test_feed_reader_reopens_a_feed_that_vanished_right_after_a_rotation(tmp_path, monkeypatch):
+    fname = tmp_path / "feed.jsonl"
+    write_feed(fname, [chunk_record(1, 1, 10)])
+    reader = FeedReader(str(fname))
+    reader.seq = 0
+    assert seqs(reader.poll()) == [1]
+
+    write_feed(fname, [chunk_record(2, 11, 20)])
+    os.remove(fname)
+    monkeypatch.setattr(reader, "_rotated", lambda: True)
+    assert seqs(reader.poll()) == [2]
+    assert reader.f is None
+
+    monkeypatch.undo()
+    write_feed(fname, [chunk_record(3, 21, 30)])
+    assert seqs(reader.poll()) == [3]
+    reader.close()
+
+
+def test_feed_reader_skips_records_it_has_and_flags_missing_ones(tmp_path):
+    fname = tmp_path / "feed.jsonl"
+    write_feed(fname, [chunk_record(seq, seq, seq) for seq in (1, 2, 3)])
+    reader = FeedReader(str(fname))
+    reader.seq = 2
+    assert seqs(reader.poll()) == [3]
+
+    write_feed(fname, [chunk_record(3, 3, 3), chunk_record(5, 5, 5), chunk_record(6, 6, 6)])
+    assert reader.poll() == []
+    assert reader.gap
+    assert reader.seq == 3
+    reader.close()
+
+
+def test_feed_reader_waits_for_complete_lines_and_skips_broken_ones(tmp_path):
+    fname = tmp_path / "feed.jsonl"
+    first, second = json.dumps(chunk_record(1, 1, 10)), json.dumps(chunk_record(2, 11, 20))
+    with open(fname, "wt") as f:
+        f.write(first[:20])
+    reader = FeedReader(str(fname))
+    reader.seq = 0
+    assert reader.poll() == []
+
+    # a crash cut the record short, the restarted scanner ends the line and numbers on as if it never was
+    with open(fname, "at") as f:
+        f.write("\n" + first + "\n" + second[:20])
+    assert seqs(reader.poll()) == [1]
+    with open(fname, "at") as f:
+        f.write(second[20:] + "\n")
+    assert seqs(reader.poll()) == [2]
+    reader.close()
+
+
+def assert_same_store(store, expected):
+    # events of feed records carry their log index
+    assert [event["args"] for event in store.events] == [event["args"] for event in expected.events]
+    indexes = {name: value for name, value in vars(store).items() if name != "events"}
+    assert indexes == {name: value for name, value in vars(expected).items() if name != "events"}
+
+
+def test_event_store_chunk_record_replaces_everything_from_its_first_block():
+    events = [
+        (1, announcement(X)),
+        (2, announcement(Y)),
+        (10, channel_opened(X, D)),
+        (11, channel_funded(X, D, HOPR)),
+        (20, channel_opened(D, Y)),
+        (21, announcement(D)),
+        (22, channel_closed(X, D)),
+    ]
+    store = store_of(events)
+    replacement = [
+        (20, channel_opened(Y, X)),
+        (25, channel_funded(Y, X, 2 * HOPR)),
+    ]
+    store.apply_feed_record(chunk_record(1, 20, 30, replacement))
+    assert_same_store(store, store_of(events[:4] + replacement))
+
+    store.apply_feed_record({"type": "delete", "seq": 2, "since_block": 11})
+    assert_same_store(store, store_of(events[:3]))
+
+    store.apply_feed_record({"type": "delete", "seq": 3, "since_block": 100})
+    assert_same_store(store, store_of(events[:3]))
+
+
+def test_event_store_truncate_drops_the_indexes_of_dropped_events():
+    events = [
+        (1, announcement(X)),
+        (5, channel_opened(X, D)),
+        (5, channel_funded(X, D, HOPR)),
+        (8, channel_closed(X, D)),
+        (8, announcement(D)),
+        (9, channel_opened(X, D)),
+    ]
+    for since_block in range(0, 11):
+        store = store_of(events)
+        store.truncate(since_block)
+        assert_same_store(store, store_of([(block, event) for block, event in events if block < since_block]))
+
+
+def test_block_time_index_interpolates_between_anchors():
+    index = BlockTimeIndex.from_state({"block_timestamps": {"blocks": [100, 110], "timestamps": [1000, 1120]}})
+
+    assert index.timestamp_at(100) == 1000
+    assert index.timestamp_at(105) == 1060
+    assert index.timestamp_at(120) == 1240
+    assert index.timestamp_at(90) == 880
+    assert index.block_at(1060) == 105
+    assert index.block_at(1065) == 105
+    assert index.block_at(1120) == 110
+
+
+def test_block_time_index_needs_two_anchors_away_from_them():
+    index = BlockTimeIndex()
+    assert index.timestamp_at(100) is None
+    assert index.block_at(1000) is None
+
+    index.append(100, 1000)
+    assert index.timestamp_at(100) == 1000
+    assert index.timestamp_at(101) is None
+    assert index.block_at(1000) == 100
+
+
+def test_block_time_index_applies_feed_records():
+    index = BlockTimeIndex()
+    index.apply_feed_record(chunk_record(1, 1, 20, timestamps=[(10, 100), (20, 200)]))
+    index.apply_feed_record(chunk_record(2, 20, 30, timestamps=[(20, 190), (30, 290)]))
+    assert list(index.blocks) == [10, 20, 30]
+    assert list(index.timestamps) == [100, 190, 290]
+
+    index.apply_feed_record({"type": "delete", "seq": 3, "since_block": 25})
+    assert list(index.blocks) == [10, 20]
+    assert index.block_at(145) == 15
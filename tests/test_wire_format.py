@@ -0,0 +1,49 @@
+import struct
+from array import array
+
+import pytest
+
+from fixed_point import INT64_MAX, MISSING, fixed_array
+from wire_format import HEADER, Snapshot, decode_snapshot, encode_snapshot
+
+
+def snapshot_of(address_count, nodes, edges):
+    node_ids, stake, importance = zip(*nodes) if nodes else ((), (), ())
+    edge_source, edge_target, balance, weight = zip(*edges) if edges else ((), (), (), ())
+    return Snapshot(address_count, array("I", node_ids), fixed_array(stake), fixed_array(importance),
+                    array("I", edge_source), array("I", edge_target), fixed_array(balance), fixed_array(weight))
+
+
+def assert_same_snapshot(snapshot, expected):
+    assert snapshot.address_count == expected.address_count
+    for column, expected_column in zip(snapshot.columns(), expected.columns()):
+        assert column.typecode == expected_column.typecode
+        assert column == expected_column
+
+
+def test_snapshot_round_trip():
+    snapshot = snapshot_of(
+        5,
+        [(0, 1, None), (2, INT64_MAX, 1000000010), (4, None, 0)],
+        [(0, 2, 100 * 10 ** 6, 3), (2, 4, None, None), (3, 0, 1, MISSING + 1)],
+    )
+    assert_same_snapshot(decode_snapshot(encode_snapshot(snapshot)), snapshot)
+
+
+def test_empty_snapshot_round_trip():
+    snapshot = snapshot_of(0, [], [])
+    payload = encode_snapshot(snapshot)
+    assert len(payload) == HEADER.size
+    assert_same_snapshot(decode_snapshot(payload), snapshot)
+
+
+def test_snapshot_layout_is_little_endian_int64_columns_first():
+    payload = encode_snapshot(snapshot_of(3, [(2, 7, None)], [(2, 1, 5, 6)]))
+    assert struct.unpack("<4I4q3I", payload) == (2, 1, 1, 3, 7, MISSING, 5, 6, 2, 2, 1)
+
+
+def test_decode_rejects_other_format_versions():
+    payload = bytearray(encode_snapshot(snapshot_of(0, [], [])))
+    payload[0] = 1
+    with pytest.raises(ValueError):
+        decode_snapshot(bytes(payload))
@@ -1,41 +1,100 @@
 import dash
+import datetime
+import flask
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
 import dash_cytoscape as cyto
+import plotly.graph_objects as go
 import requests
 from dash import html
 from dash import dcc
 from dash.dependencies import Input, Output, State
-
-cyto.load_extra_layouts()
+from dash.exceptions import PreventUpdate
+
+from hopr_network import (
+    BlockTimeIndex,
+    EventStore,
+    FeedReader,
+    channel_balance_history,
+    diff_range,
+    load_state,
+    node_stake_history,
+)
+from adjacency import AdjacencyIndex
+from fixed_point import MISSING, to_tokens
+from metrics import StageTimings
+from wire_format import decode_snapshot
 
 app = dash.Dash(__name__)
 app.title = "HOPR Channels Viz"
 
 HOPR_CHANNELS_CREATION_BLOCKHEIGHT = 20307201
+# only used until the graph API reports how far the scanner got
 HOPR_CHANNELS_LAST_INDEXED_BLOCKHEIGHT = 20637852
+HOPR_CHANNELS_EVENTS_FILE = os.environ.get(
+    "HOPR_CHANNELS_EVENTS_FILE", os.path.join("api", "hopr_channels_events.json")
+)
+HOPR_CHANNELS_FEED_FILE = os.environ.get(
+    "HOPR_CHANNELS_FEED_FILE", os.path.join("api", "hopr_channels_feed.jsonl")
+)
+REFRESH_INTERVAL_MS = 5000
+HOPR_NETWORK_API = os.environ.get("HOPR_NETWORK_API", "http://127.0.0.1:3000")
+SNAPSHOT_CACHE_SIZE = 32
+EGO_HOPS = [1, 2, 3]
+DEFAULT_BLOCKHEIGHT = 20607201  # random block height that looks alright
+# snapshots and styles prepared in the background at startup, besides the default block height
+WARM_UP_RECENT_HEIGHTS = 8
+WARM_UP_ATTEMPTS = 30
+HOPR_VIZ_LAYOUT = os.environ.get("HOPR_VIZ_LAYOUT", "klay")
+# served by dash_cytoscape as one extra bundle on top of the default one
+CYTOSCAPE_EXTRA_LAYOUTS = {"cose-bilkent", "cola", "euler", "spread", "dagre", "klay"}
+
+# duration of each stage of `update_output`, served at /metrics
+timings = StageTimings()
 
 # https://github.com/cytoscape/cytoscape.js-klay
 layout = {
-    "name": "klay",
-    "klay": {
+    "name": HOPR_VIZ_LAYOUT,
+    "animate": "true",
+    "animationDuration": 200,
+}
+if HOPR_VIZ_LAYOUT == "klay":
+    layout["klay"] = {
         "nodePlacement": "BRANDES_KOEPF",
         "nodeLayering": "LONGEST_PATH",
         "spacing": 20,
         "thoroughness": 3,
-    },
-    "animate": "true",
-    "animationDuration": 200,
-}
+    }
+# the browser only downloads the extra layouts bundle if the layout needs it
+if HOPR_VIZ_LAYOUT in CYTOSCAPE_EXTRA_LAYOUTS:
+    cyto.load_extra_layouts()
 
 styles = {
     "h1": {"text-align": "center"},
     "pre": {
         "height": "10vh",
+        "flex": "1",
+        "margin": "0",
         "border": "thin lightgrey solid",
         "background-color": "#fffea5",  # hopr yellow
         "overflowX": "scroll",
     },
+    "details": {"display": "flex", "flex-direction": "row"},
+    "history": {"width": "30%", "height": "10vh"},
     "slider": {"border-bottom": "thin lightgrey solid"},
+    "date": {"align-self": "center", "width": "220px"},
+    "ego": {"align-self": "center", "width": "360px"},
+    "hops": {"align-self": "center", "width": "120px"},
+    "compare": {
+        "display": "flex",
+        "flex-direction": "row",
+        "align-items": "center",
+        "gap": "10px",
+        "padding": "0px 20px 0px 20px",
+    },
     "cytoscape": {"width": "100%", "height": "90vh"},
     "container": {
         "background-color": "#f8f8ff",
@@ -56,68 +115,258 @@ styles = {
 }
 
 
-def edge_weight_range(edges):
-    weights = []
-    for e in edges:
-        if "weight" in e["data"]:
-            weight = int(float(e["data"]["weight"]))
-            if weight > 0:
-                weights.append(weight)
+def edge_weight_range(weights):
+    weights = [weight for weight in weights if weight > 0]
     if weights:
         return min(weights), max(weights)
     return 0, 0
 
 
-def node_stake_range(nodes):
-    stakes = []
-    for n in nodes:
-        if "stake" in n["data"]:
-            importance = int(float(n["data"]["stake"]))
-            if importance > 0:
-                stakes.append(importance)
+def node_stake_range(stakes):
+    stakes = [stake for stake in stakes if stake > 0]
     if stakes:
         return min(stakes), max(stakes)
     return 0, 0
 
 
-# nodes with at least one channel open
-def get_connected_nodes(nodes, edges):
-    nodes_by_id = {node["data"]["id"]: node for node in nodes}
-    connected_node_addresses = set()
-    for edge in edges:
-        connected_node_addresses.add(edge["data"]["source"])
-        connected_node_addresses.add(edge["data"]["target"])
-
-    connected_nodes = []
-    for addr in connected_node_addresses:
-        connected_nodes.append(nodes_by_id[addr])
-    return connected_nodes
-
-
-def max_importance_node(nodes):
-    max_importance, current_max_node = 0, None
-    for node in nodes:
-        if (
-            "importance" in node["data"]
-            and float(node["data"]["importance"]) > max_importance
-        ):
-            max_importance = float(node["data"]["importance"])
-            current_max_node = node
-    return current_max_node
-
-
-def graph_elements(blockheight):
-    resp = requests.get(
-        f"http://127.0.0.1:3000/network?format=cytoscape&blockHeight={blockheight}"
-    )
+def max_importance_index(importances):
+    max_importance, current_max_index = 0, None
+    for idx, importance in enumerate(importances):
+        if importance > max_importance:
+            max_importance = importance
+            current_max_index = idx
+    return current_max_index
+
+
+# index of every scanned event by address and channel, used for the history of tapped nodes and edges,
+# and when every block was mined, used for date navigation, plus the last change feed record they include
+def load_indexes(fname):
+    try:
+        state = load_state(fname)
+    except (IOError, json.decoder.JSONDecodeError):
+        print(f"could not load events from {fname}, history and dates are not available")
+        return EventStore(), BlockTimeIndex(), None
+    return EventStore.from_state(state), BlockTimeIndex.from_state(state), state.get("feed_seq")
+
+
+# empty until `load_event_indexes` is done, the dashboard does not wait for them to start
+event_store, block_times = EventStore(), BlockTimeIndex()
+indexes_ready = threading.Event()
+# new blocks from the scanner are applied to both indexes as they come in
+event_feed = FeedReader(HOPR_CHANNELS_FEED_FILE)
+event_store_lock = threading.Lock()
+
+
+def load_event_indexes():
+    global event_store, block_times, event_feed
+    # opened first, so chunks scanned while the events file is read are not lost
+    # if the scanner saves its state and starts a new feed meanwhile
+    feed = FeedReader(HOPR_CHANNELS_FEED_FILE)
+    feed.open()
+    store, times, feed.seq = load_indexes(HOPR_CHANNELS_EVENTS_FILE)
+    with event_store_lock:
+        event_feed.close()
+        event_store, block_times, event_feed = store, times, feed
+    drop_cached_snapshots(0)
+    indexes_ready.set()
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+# candidate spacings of the slider marks in seconds, the smallest one giving at most 10 marks is used
+MARK_STEPS = [3600, 6 * 3600, 24 * 3600, 7 * 24 * 3600, 28 * 24 * 3600]
+
+
+def block_date(blockheight):
+    timestamp = block_times.timestamp_at(blockheight)
+    if timestamp is None:
+        return None
+    return datetime.datetime.utcfromtimestamp(timestamp)
+
+
+def time_marks(min_blockheight, max_blockheight):
+    start, end = block_times.timestamp_at(min_blockheight), block_times.timestamp_at(max_blockheight)
+    if start is None or end is None or end <= start:
+        return None
+    step = next((step for step in MARK_STEPS if (end - start) / step <= 10), MARK_STEPS[-1])
+    label_format = "%b %d %H:%M" if step < 24 * 3600 else "%b %d"
+    marks = {}
+    timestamp = (int(start) // step + 1) * step
+    while timestamp < end:
+        label = datetime.datetime.utcfromtimestamp(timestamp).strftime(label_format)
+        marks[block_times.block_at(timestamp)] = label
+        timestamp += step
+    return marks
+
+
+# address dictionary of the compact snapshot format, snapshots refer to addresses by index.
+# The graph API numbers the addresses anew when it restarts without a checkpoint, the epoch
+# names the numbering the dictionary and the cached snapshots belong to
+addresses = []
+address_ids = {}
+address_epoch = None
+addresses_lock = threading.Lock()
+
+
+# replaced rather than cleared, snapshots being rendered keep the dictionary they were fetched with
+def reset_addresses(epoch):
+    global addresses, address_ids, address_epoch
+    with addresses_lock:
+        if epoch == address_epoch:
+            return
+        if address_epoch is not None:
+            print(f"address ids of the graph API changed, epoch {address_epoch} -> {epoch}")
+        addresses, address_ids, address_epoch = [], {}, epoch
+    drop_cached_snapshots(0)
+
+
+# True if the dictionary has the first `address_count` addresses of the `epoch` numbering
+def fetch_addresses(address_count, epoch):
+    with addresses_lock:
+        if epoch != address_epoch:
+            return False
+        if address_count <= len(addresses):
+            return True
+        resp = requests.get(
+            f"{HOPR_NETWORK_API}/addresses", params={"from": len(addresses)}
+        )
+        if not resp.ok:
+            print(f"resp from API server not OK: {resp.status_code} {resp.text}")
+            return False
+        if resp.headers.get("X-Address-Epoch") != epoch:
+            return False
+        for address in resp.json():
+            address_ids[address] = len(addresses)
+            addresses.append(address)
+        return address_count <= len(addresses)
+
+
+# decoded snapshots, their adjacency indexes and whole network stylesheets by the block height
+# of the snapshot, least recently used first
+snapshot_cache = OrderedDict()
+adjacency_cache = OrderedDict()
+style_cache = OrderedDict()
+snapshot_cache_lock = threading.Lock()
+
+
+def cache_get(cache, blockheight):
+    with snapshot_cache_lock:
+        if blockheight not in cache:
+            return None
+        cache.move_to_end(blockheight)
+        return cache[blockheight]
+
+
+def cache_put(cache, blockheight, value):
+    with snapshot_cache_lock:
+        cache[blockheight] = value
+        while len(cache) > SNAPSHOT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+# newly scanned or reorganised blocks change the snapshots from `since_block` on
+def drop_cached_snapshots(since_block):
+    with snapshot_cache_lock:
+        for cache in (snapshot_cache, adjacency_cache, style_cache):
+            for blockheight in [b for b in cache if b >= since_block]:
+                del cache[blockheight]
+
+
+# the graph API serves the snapshot of the last block with events at or before a block height,
+# slider values in between share it
+def snapshot_height(blockheight):
+    with event_store_lock:
+        position = event_store.bisect_block(blockheight)
+        if position == 0:
+            return blockheight
+        return event_store.blocks[position - 1]
+
+
+# block height of the snapshot and the snapshot, None if the graph API has none
+def fetch_snapshot(blockheight):
+    height = snapshot_height(blockheight)
+    snapshot = cache_get(snapshot_cache, height)
+    if snapshot is not None:
+        return height, snapshot
+
+    with timings.time("fetch"):
+        resp = requests.get(
+            f"{HOPR_NETWORK_API}/network",
+            params={"format": "compact", "blockHeight": blockheight},
+        )
     if not resp.ok:
         print(f"resp from API server not OK: {resp.status_code} {resp.text}")
-        return [], []
-
-    elements = resp.json()
-    nodes, edges = elements["nodes"], elements["edges"]
-
-    return get_connected_nodes(nodes, edges), edges
+        return blockheight, None
+
+    height = int(resp.headers.get("X-Snapshot-Height", height))
+    epoch = resp.headers.get("X-Address-Epoch")
+    if epoch != address_epoch:
+        reset_addresses(epoch)
+    with timings.time("decode"):
+        snapshot = decode_snapshot(resp.content)
+    with timings.time("fetch_addresses"):
+        if not fetch_addresses(snapshot.address_count, epoch):
+            return height, None
+    cache_put(snapshot_cache, height, snapshot)
+    return height, snapshot
+
+
+def snapshot_adjacency(height, snapshot):
+    adjacency = cache_get(adjacency_cache, height)
+    if adjacency is None or adjacency.snapshot is not snapshot:
+        with timings.time("adjacency_index"):
+            adjacency = AdjacencyIndex(snapshot)
+        cache_put(adjacency_cache, height, adjacency)
+    return adjacency
+
+
+def snapshot_elements(snapshot, node_rows, edge_indices):
+    names = addresses
+    nodes, edges = [], []
+    if snapshot.address_count > len(names):
+        # the graph API restarted with other address ids since the snapshot was fetched
+        return nodes, edges
+    for row in node_rows:
+        address_id = snapshot.node_ids[row]
+        stake, importance = snapshot.stake[row], snapshot.importance[row]
+        address = names[address_id]
+        data = {"id": address, "label": address[:10]}
+        if importance != MISSING:
+            data["importance"] = importance
+        if stake != MISSING:
+            data["stake"] = stake
+        nodes.append({"data": data})
+    for edge in edge_indices:
+        source_id, target_id = snapshot.edge_source[edge], snapshot.edge_target[edge]
+        weight, balance = snapshot.weight[edge], snapshot.balance[edge]
+        data = {"source": names[source_id], "target": names[target_id]}
+        if weight != MISSING:
+            data["weight"] = weight
+        if balance != MISSING:
+            data["balance"] = balance
+        edges.append({"data": data})
+    return nodes, edges
+
+
+# connected nodes and edges of a snapshot, or only those within `hops` of `focus`,
+# plus the stake, importance and weight columns of the rendered elements
+def graph_elements(height, snapshot, focus=None, hops=None):
+    if snapshot is None:
+        return [], [], [], [], []
+
+    if focus and hops:
+        adjacency = snapshot_adjacency(height, snapshot)
+        with timings.time("neighbourhood"):
+            address_id = address_ids.get(focus.strip().lower(), snapshot.address_count)
+            node_rows, edge_indices = adjacency.neighbourhood(address_id, hops)
+        stakes = [snapshot.stake[row] for row in node_rows]
+        importances = [snapshot.importance[row] for row in node_rows]
+        weights = [snapshot.weight[edge] for edge in edge_indices]
+    else:
+        node_rows, edge_indices = range(len(snapshot.node_ids)), range(len(snapshot.edge_source))
+        stakes, importances, weights = snapshot.stake, snapshot.importance, snapshot.weight
+
+    with timings.time("elements"):
+        nodes, edges = snapshot_elements(snapshot, node_rows, edge_indices)
+    return nodes, edges, stakes, importances, weights
 
 
 app.layout = html.Div(
@@ -135,6 +384,28 @@ app.layout = html.Div(
                     id="blockheight" "",
                     style=styles["h1"],
                 ),
+                dcc.Input(
+                    id="date-input",
+                    type="text",
+                    placeholder="Go to YYYY-MM-DD HH:MM (UTC)",
+                    debounce=True,
+                    style=styles["date"],
+                ),
+                dcc.Input(
+                    id="ego-address",
+                    type="text",
+                    placeholder="Focus on address (or tap a node)",
+                    debounce=True,
+                    style=styles["ego"],
+                ),
+                dcc.Dropdown(
+                    id="ego-hops",
+                    options=[{"label": "Whole network", "value": 0}]
+                    + [{"label": f"{hops} hop{'s' if hops > 1 else ''}", "value": hops} for hops in EGO_HOPS],
+                    value=0,
+                    clearable=False,
+                    style=styles["hops"],
+                ),
             ],
         ),
         html.Div(
@@ -144,12 +415,16 @@ app.layout = html.Div(
                     HOPR_CHANNELS_CREATION_BLOCKHEIGHT,
                     HOPR_CHANNELS_LAST_INDEXED_BLOCKHEIGHT,
                     1,
-                    marks=None,
-                    value=20607201,  # random block height that looks alright
+                    marks=time_marks(
+                        HOPR_CHANNELS_CREATION_BLOCKHEIGHT,
+                        HOPR_CHANNELS_LAST_INDEXED_BLOCKHEIGHT,
+                    ),
+                    value=DEFAULT_BLOCKHEIGHT,
                     id="blockheight-slider",
                     tooltip={"placement": "bottom", "always_visible": False},
                     updatemode="drag",
                 ),
+                dcc.Interval(id="refresh-interval", interval=REFRESH_INTERVAL_MS),
             ],
         ),
         cyto.Cytoscape(
@@ -162,7 +437,34 @@ app.layout = html.Div(
             zoom=1,
             maxZoom=2,
         ),
-        html.P(id="cytoscape-hopr-details", style=styles["pre"]),
+        html.Div(
+            style=styles["details"],
+            children=[
+                html.P(id="cytoscape-hopr-details", style=styles["pre"]),
+                dcc.Graph(
+                    id="cytoscape-hopr-history",
+                    style=styles["history"],
+                    config={"displayModeBar": False},
+                ),
+            ],
+        ),
+        html.Div(
+            style=styles["compare"],
+            children=[
+                dcc.Input(
+                    id="compare-from",
+                    type="number",
+                    placeholder="From block height",
+                ),
+                dcc.Input(
+                    id="compare-to",
+                    type="number",
+                    placeholder="To block height (slider)",
+                ),
+                html.Button("Compare", id="compare-button"),
+                html.P(id="compare-result", style=styles["pre"]),
+            ],
+        ),
         dcc.Link(
             "HoprChannels contract",
             href="https://blockscout.com/xdai/mainnet/address/0xD2F008718EEdD7aF7E9a466F5D68bb77D03B8F7A/transactions",
@@ -176,14 +478,119 @@ def addr_link(addr):
     return f"https://blockscout.com/xdai/mainnet/address/{addr}/transactions"
 
 
+# amounts are fixed-point integers in the element data, shown in HOPR
+def detail_value(value):
+    if isinstance(value, int):
+        return to_tokens(value)
+    return value
+
+
+def history_figure(history, title):
+    blocks = [block for block, _ in history]
+    values = [to_tokens(value) for _, value in history]
+    figure = go.Figure(go.Scatter(x=blocks, y=values, line_shape="hv", mode="lines"))
+    figure.update_layout(
+        title={"text": title, "font": {"size": 12}},
+        margin={"l": 40, "r": 10, "t": 25, "b": 20},
+        paper_bgcolor="#f8f8ff",
+        xaxis={"tickformat": "d"},
+        yaxis={"title": "HOPR"},
+    )
+    return figure
+
+
+# None while the graph API is not reachable
+def api_status():
+    try:
+        resp = requests.get(f"{HOPR_NETWORK_API}/status")
+    except requests.exceptions.ConnectionError:
+        return None
+    if not resp.ok:
+        print(f"resp from API server not OK: {resp.status_code} {resp.text}")
+        return None
+    return resp.json()
+
+
+def last_indexed_blockheight():
+    status = api_status()
+    return None if status is None else status["lastIndexedBlock"]
+
+
+# pick up newly scanned blocks and extend the slider without restarting
+@app.callback(
+    Output("blockheight-slider", "max"),
+    Output("blockheight-slider", "marks"),
+    Input("refresh-interval", "n_intervals"),
+    State("blockheight-slider", "min"),
+    State("blockheight-slider", "max"),
+    State("blockheight-slider", "marks"),
+)
+def refresh_last_indexed_blockheight(n_intervals, current_min, current_max, current_marks):
+    # the feed continues where the events file ends, it is only read once the file is indexed
+    if indexes_ready.is_set():
+        with event_store_lock:
+            for record in event_feed.poll():
+                event_store.apply_feed_record(record)
+                block_times.apply_feed_record(record)
+                drop_cached_snapshots(record.get("from_block", record.get("since_block")))
+            reload = event_feed.gap
+        if reload:
+            print(f"records missing from {HOPR_CHANNELS_FEED_FILE}, reloading {HOPR_CHANNELS_EVENTS_FILE}")
+            indexes_ready.clear()
+            threading.Thread(target=load_event_indexes, daemon=True).start()
+
+    blockheight = last_indexed_blockheight() or current_max
+    # the marks are also missing until the indexes are loaded
+    if blockheight == current_max and (current_marks or not indexes_ready.is_set()):
+        raise PreventUpdate
+    with event_store_lock:
+        marks = time_marks(current_min, blockheight)
+    return blockheight, marks
+
+
+@app.callback(
+    Output("blockheight-slider", "value"),
+    Input("date-input", "value"),
+    State("blockheight-slider", "min"),
+    State("blockheight-slider", "max"),
+)
+def go_to_date(date, min_blockheight, max_blockheight):
+    if not date:
+        raise PreventUpdate
+    try:
+        when = datetime.datetime.fromisoformat(date.strip())
+    except ValueError:
+        raise PreventUpdate
+    timestamp = when.replace(tzinfo=datetime.timezone.utc).timestamp()
+    with event_store_lock:
+        blockheight = block_times.block_at(timestamp)
+    if blockheight is None:
+        raise PreventUpdate
+    return min(max(blockheight, min_blockheight), max_blockheight)
+
+
+# a tapped node becomes the focus of the ego-network view
+@app.callback(
+    Output("ego-address", "value"),
+    Input("cytoscape-hopr-channels", "tapNodeData"),
+)
+def focus_tapped_node(tap_node_data):
+    if not tap_node_data:
+        raise PreventUpdate
+    return tap_node_data["id"]
+
+
 @app.callback(
     Output("cytoscape-hopr-details", "children"),
+    Output("cytoscape-hopr-history", "figure"),
     Input("cytoscape-hopr-channels", "tapNodeData"),
     Input("cytoscape-hopr-channels", "tapEdgeData"),
+    State("blockheight-slider", "value"),
 )
-def display_tap_details(tap_node_data, tap_edge_data):
+def display_tap_details(tap_node_data, tap_edge_data, blockheight):
     ctx = dash.callback_context
     details = []
+    figure = history_figure([], "")
     if ctx.triggered:
         tap_event = ctx.triggered[0]["prop_id"].split(".")[1]
         if tap_event == "tapEdgeData":
@@ -195,7 +602,16 @@ def display_tap_details(tap_node_data, tap_edge_data):
                     details.append(html.A(f"{v}", href=addr_link(v), target="_blank"))
                     details.append(f" ")
                 else:
-                    details.append(f"{k}: {v} ")
+                    details.append(f"{k}: {detail_value(v)} ")
+            with event_store_lock:
+                history = channel_balance_history(
+                    event_store,
+                    tap_edge_data["source"],
+                    tap_edge_data["target"],
+                    blockheight,
+                )
+            details.append(f"events: {len(history)} ")
+            figure = history_figure(history, "Channel balance")
         elif tap_event == "tapNodeData":
             for k, v in tap_node_data.items():
                 if k == "id":
@@ -203,13 +619,91 @@ def display_tap_details(tap_node_data, tap_edge_data):
                     details.append(html.A(f"{v}", href=addr_link(v), target="_blank"))
                     details.append(f" ")
                 else:
-                    details.append(f"{k}: {v} ")
+                    details.append(f"{k}: {detail_value(v)} ")
+            with event_store_lock:
+                history = node_stake_history(
+                    event_store, tap_node_data["id"], blockheight
+                )
+            details.append(f"events: {len(history)} ")
+            figure = history_figure(history, "Stake")
+    return details, figure
+
+
+# entries listed per kind of change in the compare view
+COMPARE_MAX_ENTRIES = 10
+
+
+def top_deltas(deltas, n):
+    def change(delta):
+        before, after = delta
+        return abs((after or 0) - (before or 0))
+
+    return sorted(deltas.items(), key=lambda item: change(item[1]), reverse=True)[:n]
+
+
+def format_hopr(value):
+    if value is None:
+        return "n/a"
+    return f"{to_tokens(value):.2f}"
+
+
+def format_importance(value):
+    if value is None:
+        return "n/a"
+    return f"{to_tokens(value):.3e}"
+
+
+def compare_details(diff):
+    details = [f"blocks {diff.from_block} to {diff.to_block}: "]
+    for label, keys in (
+        ("opened", diff.opened),
+        ("closed", diff.closed),
+        ("re-funded", diff.refunded),
+        ("new nodes", diff.appeared),
+    ):
+        details.append(f"{label}: {len(keys)} ")
+    details.append(html.Br())
+    for label, keys in (("opened", diff.opened), ("closed", diff.closed)):
+        for key in keys[:COMPARE_MAX_ENTRIES]:
+            source, dest = key.split(":")
+            details.append(f"{label} ")
+            details.append(html.A(source, href=addr_link(source), target="_blank"))
+            details.append(" -> ")
+            details.append(html.A(dest, href=addr_link(dest), target="_blank"))
+            details.append(html.Br())
+    for label, deltas, fmt in (
+        ("stake", diff.stake_deltas, format_hopr),
+        ("importance", diff.importance_deltas, format_importance),
+    ):
+        for account, (before, after) in top_deltas(deltas, COMPARE_MAX_ENTRIES):
+            details.append(f"{label} ")
+            details.append(html.A(account, href=addr_link(account), target="_blank"))
+            details.append(f" {fmt(before)} -> {fmt(after)}")
+            details.append(html.Br())
     return details
 
 
-def edge_weight_styles(edges, n):
+@app.callback(
+    Output("compare-result", "children"),
+    Input("compare-button", "n_clicks"),
+    State("compare-from", "value"),
+    State("compare-to", "value"),
+    State("blockheight-slider", "value"),
+)
+def compare_blockheights(n_clicks, from_blockheight, to_blockheight, blockheight):
+    if not n_clicks or from_blockheight is None:
+        raise PreventUpdate
+    if to_blockheight is None:
+        to_blockheight = blockheight
+    from_blockheight, to_blockheight = sorted((int(from_blockheight), int(to_blockheight)))
+    with event_store_lock:
+        diff = diff_range(event_store, from_blockheight, to_blockheight)
+    return compare_details(diff)
+
+
+def edge_weight_styles(weights, n):
     styles = []
-    min_weight, max_weight = edge_weight_range(edges)
+    min_weight, max_weight = edge_weight_range(weights)
     weight_classes = [
         min_weight + ((max_weight - min_weight) / (n - 1)) * i for i in range(n)
     ]
@@ -225,10 +719,10 @@ def edge_weight_styles(edges, n):
     return styles
 
 
-def node_appearance_styles(nodes):
+def node_appearance_styles(stakes):
     styles = []
     colors = ["#0516b1", "#1c299e" "#3443cf", "#081373"]
-    min_stake, max_stake = node_stake_range(nodes)
+    min_stake, max_stake = node_stake_range(stakes)
     stake_classes = [
         min_stake + ((max_stake - min_stake) / (len(colors) - 1)) * i
         for i in range(len(colors))
@@ -248,16 +742,8 @@ def node_appearance_styles(nodes):
     return styles
 
 
-@app.callback(
-    Output("cytoscape-hopr-channels", "elements"),
-    Output("cytoscape-hopr-channels", "stylesheet"),
-    Output("blockheight", "children"),
-    Input("blockheight-slider", "value"),
-    State("cytoscape-hopr-channels", "elements"),
-    State("cytoscape-hopr-channels", "stylesheet"),
-)
-def update_output(blockheight, elements, stylesheet):
-    connected_nodes, edges = graph_elements(blockheight)
+# stylesheet for the rendered elements and the index of the node with the highest importance
+def graph_stylesheet(stakes, importances, weights):
     stylesheet = [
         {
             "selector": "node",
@@ -274,9 +760,9 @@ def update_output(blockheight, elements, stylesheet):
             },
         },
     ]
-    max_node = max_importance_node(connected_nodes)
-    if max_node:
-        max_node["classes"] = "max-importance"
+    with timings.time("max_importance_node"):
+        max_index = max_importance_index(importances)
+    if max_index is not None:
         stylesheet.append(
             {
                 "selector": ".max-importance",
@@ -288,10 +774,138 @@ def update_output(blockheight, elements, stylesheet):
             }
         )
 
-    stylesheet.extend(edge_weight_styles(edges, 5))
-    stylesheet.extend(node_appearance_styles(connected_nodes))
-    return connected_nodes + edges, stylesheet, f"Block height: {blockheight}"
+    with timings.time("edge_weight_styles"):
+        stylesheet.extend(edge_weight_styles(weights, 5))
+    with timings.time("node_appearance_styles"):
+        stylesheet.extend(node_appearance_styles(stakes))
+
+    return stylesheet, max_index
+
+
+# same for a whole snapshot, cached with it
+def snapshot_stylesheet(height, snapshot):
+    styled = cache_get(style_cache, height)
+    if styled is None:
+        if snapshot is None:
+            return graph_stylesheet([], [], [])
+        styled = graph_stylesheet(snapshot.stake, snapshot.importance, snapshot.weight)
+        cache_put(style_cache, height, styled)
+    return styled
+
+
+@app.callback(
+    Output("cytoscape-hopr-channels", "elements"),
+    Output("cytoscape-hopr-channels", "stylesheet"),
+    Output("blockheight", "children"),
+    Input("blockheight-slider", "value"),
+    Input("ego-address", "value"),
+    Input("ego-hops", "value"),
+    State("cytoscape-hopr-channels", "elements"),
+    State("cytoscape-hopr-channels", "stylesheet"),
+)
+def update_output(blockheight, ego_address, ego_hops, elements, stylesheet):
+    start = time.perf_counter()
+    height, snapshot = fetch_snapshot(blockheight)
+    connected_nodes, edges, stakes, importances, weights = graph_elements(
+        height, snapshot, ego_address, ego_hops
+    )
+    if ego_address and ego_hops:
+        stylesheet, max_index = graph_stylesheet(stakes, importances, weights)
+    else:
+        stylesheet, max_index = snapshot_stylesheet(height, snapshot)
+    # no elements when the address dictionary was reset since the snapshot was fetched,
+    # while the stylesheet may still come from the cache
+    if max_index is not None and max_index < len(connected_nodes):
+        connected_nodes[max_index]["classes"] = "max-importance"
+
+    duration = time.perf_counter() - start
+    timings.record("update_output", duration)
+    if flask.has_request_context():
+        flask.g.update_output_seconds = duration
+    title = f"Block height: {blockheight}"
+    with event_store_lock:
+        when = block_date(blockheight)
+    if when:
+        title += f" ({when.strftime(DATE_FORMAT)} UTC)"
+    if ego_address and ego_hops:
+        title += f", {ego_hops} hops around {ego_address.strip()[:10]}"
+    return connected_nodes + edges, stylesheet, title
+
+
+@app.server.before_request
+def start_request_timer():
+    flask.g.request_start = time.perf_counter()
+
+
+@app.server.after_request
+def record_serialize_time(response):
+    # everything Dash does around `update_output` in the same request,
+    # dominated by serializing the elements and stylesheet to JSON
+    if "update_output_seconds" in flask.g:
+        request_seconds = time.perf_counter() - flask.g.request_start
+        timings.record("serialize", request_seconds - flask.g.update_output_seconds)
+    return response
+
+
+@app.server.route("/metrics")
+def metrics():
+    return flask.jsonify(timings.summary())
+
+
+# load the event indexes and prepare the default and the latest snapshots before anyone asks for them
+def warm_up():
+    load_event_indexes()
+    pending = [DEFAULT_BLOCKHEIGHT]
+    with event_store_lock:
+        position = len(event_store.blocks)
+        while position and len(pending) <= WARM_UP_RECENT_HEIGHTS:
+            block = event_store.blocks[position - 1]
+            pending.append(block)
+            position = event_store.bisect_block(block - 1)
+
+    # the graph API may still be starting or replaying events, heights it cannot serve yet are retried
+    for _ in range(WARM_UP_ATTEMPTS):
+        # asked before fetching, heights missing once the replay is done are not retried
+        status = api_status()
+        failed = []
+        for blockheight in pending:
+            try:
+                height, snapshot = fetch_snapshot(blockheight)
+            except requests.exceptions.ConnectionError:
+                snapshot = None
+            if snapshot is None:
+                failed.append(blockheight)
+            else:
+                snapshot_stylesheet(height, snapshot)
+        pending = failed
+        if not pending:
+            return
+        if status is not None and not status["replaying"]:
+            break
+        time.sleep(1)
+    print(f"could not warm up the snapshots at {pending}")
+
+
+warm_up_thread = None
+warm_up_lock = threading.Lock()
+
+
+def start_background():
+    """Start the warm-up in a background thread, once per process.
+
+    Called by `__main__` before serving. Under a WSGI server it is started with the first
+    request, unless the entry point calls it beforehand. Importing `viz` starts nothing.
+    """
+    global warm_up_thread
+    with warm_up_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+            warm_up_thread.start()
+
+
+app.server.before_first_request(start_background)
 
 
 if __name__ == "__main__":
+    start_background()
     app.run_server(debug=False)
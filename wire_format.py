@@ -0,0 +1,77 @@
+"""Compact binary snapshot format served at `/network?format=compact` by the graph API.
+
+Addresses are sent once per session from `/addresses` and referred to by integer
+ids. A snapshot is a little-endian header of four uint32 (format version, node count,
+edge count, address count) followed by the columns, int64 columns first:
+
+    stake, importance (per node), balance, weight (per edge),
+    node id (per node), source id, target id (per edge) as uint32
+
+Amounts are fixed-point values, missing values (NaN in the graph layer) are
+`fixed_point.MISSING`. Version 1 sent the amounts as float64.
+"""
+
+import struct
+import sys
+from array import array
+
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4I")
+
+
+class Snapshot:
+    """Columns of one snapshot, nodes and edges refer to addresses by id."""
+
+    def __init__(self, address_count: int, node_ids: array, stake: array, importance: array,
+                 edge_source: array, edge_target: array, balance: array, weight: array):
+        self.address_count = address_count
+        self.node_ids = node_ids
+        self.stake = stake
+        self.importance = importance
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.balance = balance
+        self.weight = weight
+
+    def columns(self):
+        return [
+            self.stake, self.importance, self.balance, self.weight,
+            self.node_ids, self.edge_source, self.edge_target,
+        ]
+
+
+def encode_snapshot(snapshot: Snapshot) -> bytes:
+    payload = [HEADER.pack(FORMAT_VERSION, len(snapshot.node_ids), len(snapshot.edge_source), snapshot.address_count)]
+    for column in snapshot.columns():
+        if sys.byteorder == "big":
+            column = array(column.typecode, column)
+            column.byteswap()
+        payload.append(column.tobytes())
+    return b"".join(payload)
+
+
+def decode_snapshot(payload: bytes) -> Snapshot:
+    version, node_count, edge_count, address_count = HEADER.unpack_from(payload)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {version}")
+
+    offset = HEADER.size
+
+    def column(typecode, count):
+        nonlocal offset
+        values = array(typecode)
+        end = offset + count * values.itemsize
+        values.frombytes(payload[offset:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        offset = end
+        return values
+
+    stake = column("q", node_count)
+    importance = column("q", node_count)
+    balance = column("q", edge_count)
+    weight = column("q", edge_count)
+    node_ids = column("I", node_count)
+    edge_source = column("I", edge_count)
+    edge_target = column("I", edge_count)
+    return Snapshot(address_count, node_ids, stake, importance, edge_source, edge_target, balance, weight)